@@ -60,6 +60,9 @@ setup(
             'Pygments==1.6',
             'Sphinx==1.2.2',
         ],
+        'numpy': [
+            'numpy',
+        ],
     },
     package_data={
         'storyboard': [
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+"""Cache extracted video frames on disk.
+
+Classes
+-------
+.. autosummary::
+    FrameCache
+
+Routines
+--------
+.. autosummary::
+    file_identity
+
+----
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import errno
+import hashlib
+import os
+import tempfile
+
+from PIL import Image
+
+from storyboard.util import read_param as _read_param
+
+
+# os.replace (overwriting the destination on all platforms) is Python
+# 3.3+; os.rename does the same on POSIX
+_replace = getattr(os, 'replace', os.rename)
+
+_ENTRY_SUFFIX = '.png'
+
+
+def file_identity(path):
+    """Identify a file by its metadata, without reading its content.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+
+    Returns
+    -------
+    identity : str
+        A str composed of the device, inode, size and modification time
+        of the file, which changes whenever the file is replaced or
+        modified (in any sane way).
+
+    Raises
+    ------
+    OSError
+        If the file cannot be stat'ed.
+
+    """
+
+    stat = os.stat(path)
+    return 'stat:%d:%d:%d:%r' % (stat.st_dev, stat.st_ino, stat.st_size,
+                                 stat.st_mtime)
+
+
+class FrameCache(object):
+    """On-disk cache of extracted video frames.
+
+    Frames are stored as PNG images, one file per frame, named after a
+    digest of everything that determines the frame: the identity of the
+    video file, the timestamp, and the extraction parameters (including
+    the size the frame was scaled to, i.e., the thumbnail geometry). See
+    the `key` method.
+
+    The cache is safe to share between processes: entries are written
+    to temporary files and atomically renamed into place, and readers
+    never see partially written entries. The total size of the cache is
+    bounded by `max_size`; least recently used entries are evicted first
+    when the limit is exceeded (see the `trim` method).
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path to the cache directory. Created if it doesn't exist.
+    params : dict, optional
+        Optional parameters enclosed in a dict. Default is ``None``.
+        See the "Other Parameters" section for understood key/value
+        pairs.
+
+    Raises
+    ------
+    OSError
+        If the cache directory cannot be created.
+
+    Other Parameters
+    ----------------
+    max_size : int, optional
+        Maximum total size of the cache, in bytes. Default is 1 GiB.
+
+    Attributes
+    ----------
+    cache_dir : str
+    max_size : int
+
+    Notes
+    -----
+    Recency of use is tracked through the modification time of the
+    entries, which is bumped on every hit, since access times are
+    unreliable (many file systems are mounted with ``noatime``).
+
+    """
+
+    def __init__(self, cache_dir, params=None):
+        """Initialize the FrameCache class.
+
+        See the class docstring for parameters.
+
+        """
+
+        if params is None:
+            params = {}
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = _read_param(params, 'max_size', 1024 ** 3)
+        if self.max_size < 0:
+            raise ValueError("max_size should be nonnegative, got %s" %
+                             self.max_size)
+        _makedirs(self.cache_dir)
+
+    @staticmethod
+    def key(identity, timestamp, params=None):
+        """Compute the cache key of a frame.
+
+        Parameters
+        ----------
+        identity : str
+            Identity of the video file, e.g., as returned by
+            `file_identity`, or a content digest if the cache should
+            survive moves and copies of the file.
+        timestamp : float
+            Timestamp of the frame.
+        params : dict, optional
+            Parameters that affect the extracted frame, e.g., the
+            `size` and seeking parameters passed to
+            ``storyboard.frame.extract_frame``. Values should have
+            stable ``repr``\\ s. Default is ``None``.
+
+        Returns
+        -------
+        key : str
+            A hex digest.
+
+        """
+
+        if params is None:
+            params = {}
+        # repr of floats is exact (round-trippable) in Python 2.7 and 3
+        components = [identity, repr(float(timestamp))]
+        components += ['%s=%r' % (name, params[name])
+                       for name in sorted(params)]
+        return hashlib.sha1('\0'.join(components).encode('utf-8')).hexdigest()
+
+    def has(self, key):
+        """Check whether a frame is in the cache, without loading it.
+
+        Note that the entry might still be evicted by another process
+        before it is retrieved.
+
+        Parameters
+        ----------
+        key : str
+            As returned by the `key` method.
+
+        Returns
+        -------
+        bool
+
+        """
+
+        return os.path.isfile(self._entry_path(key))
+
+    def get(self, key):
+        """Retrieve a frame image from the cache.
+
+        Parameters
+        ----------
+        key : str
+            As returned by the `key` method.
+
+        Returns
+        -------
+        image : PIL.Image.Image
+            The cached image (fully loaded), or ``None`` on a miss.
+
+        """
+
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as fileobj:
+                image = Image.open(fileobj)
+                image.load()
+        except (IOError, OSError, SyntaxError):
+            # missing (or evicted, or corrupt beyond belief)
+            return None
+        try:
+            # mark as recently used
+            os.utime(path, None)
+        except OSError:
+            # evicted in the meantime; doesn't matter
+            pass
+        return image
+
+    def put(self, key, image):
+        """Store a frame image in the cache.
+
+        The cache is not trimmed; call `trim` after a batch of `put`\\ s
+        to enforce `max_size`.
+
+        Parameters
+        ----------
+        key : str
+            As returned by the `key` method.
+        image : PIL.Image.Image
+
+        Raises
+        ------
+        OSError
+            If the entry cannot be written.
+
+        """
+
+        path = self._entry_path(key)
+        _makedirs(os.path.dirname(path))
+        fd, temp_path = tempfile.mkstemp(prefix='.tmp-', suffix=_ENTRY_SUFFIX,
+                                         dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as fileobj:
+                # frames are short lived data; trade compression ratio
+                # for speed
+                image.save(fileobj, 'png', compress_level=1)
+            _replace(temp_path, path)
+        except:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def trim(self):
+        """Evict least recently used entries until within `max_size`.
+
+        Returns
+        -------
+        evicted : int
+            Number of entries evicted.
+
+        """
+
+        entries = []
+        total_size = 0
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if ((filename.startswith('.tmp-') or
+                     not filename.endswith(_ENTRY_SUFFIX))):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # removed by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        evicted = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except OSError:
+                # removed by another process
+                pass
+            total_size -= size
+        return evicted
+
+    def _entry_path(self, key):
+        """Return the path of the entry of a key."""
+        # shard by the first two hex digits to keep directories small
+        return os.path.join(self.cache_dir, key[:2], key + _ENTRY_SUFFIX)
+
+
+def _makedirs(path):
+    """Create a directory recursively, if it doesn't already exist."""
+    try:
+        os.makedirs(path)
+    except OSError as err:
+        # exist_ok is Python 3.2+
+        if err.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
@@ -16,6 +16,10 @@ import os
 import subprocess
 
 
+# binaries that passed check_bins, which are not checked again
+_checked_bins = set()
+
+
 def guess_bins():
     """Guess ffmpeg and ffprobe binary names based on OS.
 
@@ -54,11 +58,17 @@ def check_bins(bins):
     OSError
         If check fails.
 
+    Notes
+    -----
+    Successful checks are remembered for the lifetime of the process,
+    so that checking the same binaries over and over (e.g., once for
+    each video in a batch) doesn't spawn any more processes.
+
     """
 
     with open(os.devnull, 'wb') as devnull:
         for binary in bins:
-            if binary is None:
+            if binary is None or binary in _checked_bins:
                 continue
             try:
                 subprocess.check_call([binary, '-version'],
@@ -67,4 +77,5 @@ def check_bins(bins):
                 raise OSError("%s may be corrupted" % binary)
             except OSError:
                 raise OSError("%s not found on PATH" % binary)
+            _checked_bins.add(binary)
     return True
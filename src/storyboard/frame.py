@@ -11,19 +11,35 @@ Routines
 --------
 .. autosummary::
     extract_frame
+    iter_frames
+    batch_extract_frames
+    extract_frame_grid
+    render_audio_strip
+    sample_stream_frames
+    select_scene_frames
+    screen_frames
+    find_sharpest_frames
 
 ----
 
 """
 
 from __future__ import absolute_import
+from __future__ import division
 from __future__ import print_function
 
+import collections
 import io
+import math
 import os
+import re
+import struct
 import subprocess
+import tempfile
+import threading
+import time
 
-from PIL import Image
+from PIL import Image, ImageChops, ImageColor, ImageFilter, ImageStat
 
 from storyboard import fflocate
 from storyboard.util import read_param as _read_param
@@ -90,72 +106,2373 @@ def extract_frame(video_path, timestamp, params=None):
     ffmpeg_bin : str, optional
         Name or path of FFmpeg binary. If ``None``, make educated guess
         using ``storyboard.fflocate.guess_bins``. Default is ``None``.
+    transport : {'image', 'rawvideo'}, optional
+        How the frame is transferred from FFmpeg. ``'image'`` means the
+        frame is encoded as an image (see `codec`) by FFmpeg and decoded
+        again by Pillow; ``'rawvideo'`` means the frame is transferred
+        as raw 8-bit RGB pixels, which avoids the encode/decode round
+        trip altogether, but requires `size`. Default is ``'image'``.
     codec : str, optional
-        Image codec used by FFmpeg when outputing the frame. Default is
-        ``'png'``. There is no need to touch this option unless your
-        FFmpeg cannot encode PNG, which is very unlikely.
+        Image codec used by FFmpeg when outputing the frame, if
+        `transport` is ``'image'``. Default is ``'png'``. There is no
+        need to touch this option unless your FFmpeg cannot encode PNG,
+        which is very unlikely. PNG frames are always 8-bit RGB, even
+        for sources with higher bit depths.
+    size : tuple, optional
+        A tuple ``(width, height)``. If specified, the frame is scaled
+        to this size by FFmpeg. Required if `transport` is
+        ``'rawvideo'``. Default is ``None``.
     frame_by_frame : bool, optional
         Whether to seek frame by frame, i.e., whether to use output
         seeking (see https://trac.ffmpeg.org/wiki/Seeking). Default is
         ``False``. Note that seeking frame by frame is *extremely* slow,
         but accurate. Only use this when the container metadata is wrong
-        or missing, so that input seeking produces wrong image.
+        or missing, so that input seeking produces wrong image. See also
+        `seek_margin`.
+    seek_margin : float, optional
+        If not ``None`` and `frame_by_frame` is ``True``, use hybrid
+        seeking: input seek (coarsely) to `seek_margin` seconds before
+        `timestamp`, then seek frame by frame from there, so that at
+        most `seek_margin` seconds plus a GOP are decoded instead of
+        everything from the start of the video. The point the coarse
+        seek actually lands on is checked, and if it lies beyond
+        `timestamp` (or nothing is decoded at all), which happens when
+        the container index is broken, the frame is extracted again
+        with plain frame by frame seeking. Default is ``None``.
+    keyframes_only : bool, optional
+        Whether to return the keyframe at or before `timestamp` instead
+        of the exact frame. Only the keyframe is decoded, which makes
+        extraction considerably cheaper, especially for long GOPs.
+        Ignored if `frame_by_frame` is ``True``. Default is ``False``.
+    decode_profile : {'default', 'turbo'}, optional
+        ``'turbo'`` trades decoding quality for speed: audio, subtitle
+        and data streams are discarded at the demuxer, and the in-loop
+        deblocking filter is skipped (``-skip_loop_filter all``), which
+        introduces slight blocking that is invisible at thumbnail sizes
+        but saves some H.264/HEVC decoding time. Default is
+        ``'default'``.
+    lowres : int, optional
+        Let the decoder downscale the frame by a factor of ``2 **
+        lowres`` while decoding (FFmpeg's ``-lowres``), which is much
+        cheaper than decoding at full resolution and scaling down
+        afterwards. Only some codecs (e.g., MJPEG, MPEG-1/2, MPEG-4 Part
+        2, JPEG 2000) support this; others silently ignore it. Combine
+        with `size`, since otherwise the resolution of the frame depends
+        on the codec. Default is 0.
+    draft : bool, optional
+        If ``True``, `codec` is ``'mjpeg'`` (with ``'image'``
+        `transport`) and `size` is specified, FFmpeg doesn't scale the
+        frame; instead, Pillow decodes the JPEG straight at 1/2, 1/4 or
+        1/8 of its size, whichever is the smallest that is still no
+        smaller than `size` (see ``PIL.Image.Image.draft``), and resizes
+        it the rest of the way. Ignored otherwise. Default is
+        ``False``.
+    timeout : float, optional
+        Deadline for FFmpeg to produce the frame, in seconds. If
+        exceeded, FFmpeg is killed and an `OSError` is raised, unless
+        `hedge_offset` is specified. Default is ``None`` (no deadline).
+    hedge_offset : float, optional
+        If not ``None`` and `timeout` is specified, hedge against
+        pathological seeks (e.g., into a corrupt GOP, or near the end of
+        a truncated file): when the deadline is exceeded, FFmpeg is not
+        killed; instead, the frame `hedge_offset` seconds earlier (or
+        later, if that is before the start of the video) is extracted
+        in parallel, with the same deadline, and whichever frame
+        arrives first is returned, while the other FFmpeg process is
+        killed. The first FFmpeg process is killed in any case when the
+        deadline of the second one expires, so that the frame takes at
+        most twice `timeout`. The hedge also steps in right away if the
+        first attempt fails outright. The `timestamp` attribute of the
+        returned frame tells which one won. Default is ``None``.
+
+    """
+
+    opts = _read_extraction_params(params)
+
+    if not os.path.exists(video_path):
+        raise OSError("video file '%s' does not exist" % video_path)
+
+    return _extract_frame_hedged(video_path, timestamp, opts)
+
+
+def _extract_frame_plain(video_path, timestamp, opts, register=None):
+    """Extract a video frame without hedging.
+
+    Arguments are the same as those of `_extract_frame_hedged`.
+
+    """
+
+    if opts['frame_by_frame'] and opts['seek_margin'] is not None:
+        return _extract_frame_hybrid(video_path, timestamp, opts,
+                                     register=register)
+
+    ffmpeg_args = [opts['ffmpeg_bin']]
+    if opts['frame_by_frame']:
+        # output seeking
+        ffmpeg_args += _input_args(opts)
+        ffmpeg_args += [
+            '-i', video_path,
+            '-ss', str(timestamp),
+        ]
+    else:
+        # input seeking
+        ffmpeg_args += _input_args(opts, timestamp)
+        ffmpeg_args += ['-i', video_path]
+        if opts['keyframes_only']:
+            # the keyframe lies before the seek point, i.e., at a
+            # negative output timestamp, which the default constant
+            # frame rate sync would drop in favor of a later frame
+            ffmpeg_args += ['-vsync', 'passthrough']
+    if opts['decode_profile'] == 'turbo':
+        ffmpeg_args += ['-map', '0:v:0']
+    if opts['size'] is not None and not opts['draft']:
+        ffmpeg_args += ['-vf', _scale_filter(opts['size'])]
+    ffmpeg_args += [
+        '-vframes', '1',
+        '-hide_banner',
+    ]
+    ffmpeg_args += _output_args(opts, single=True)
+
+    frames = list(_run_ffmpeg(ffmpeg_args, [timestamp], opts,
+                              register=register))
+    return frames[0]
+
+
+def _extract_frame_hedged(video_path, timestamp, opts, register=None):
+    """Extract a video frame, hedging if asked to.
+
+    See the `timeout` and `hedge_offset` parameters of `extract_frame`
+    for the strategy. `opts` is a dict returned by
+    `_read_extraction_params`, and `register` is passed on to
+    `_run_ffmpeg`.
+
+    Returns
+    -------
+    frame : Frame
+
+    Raises
+    ------
+    OSError
+        If both attempts fail (or the only one, if there is no need to
+        hedge).
+
+    """
+
+    if opts['timeout'] is None or opts['hedge_offset'] is None:
+        return _extract_frame_plain(video_path, timestamp, opts,
+                                    register=register)
+
+    hedge_timestamp = timestamp - opts['hedge_offset']
+    if hedge_timestamp < 0:
+        hedge_timestamp = timestamp + opts['hedge_offset']
+
+    condition = threading.Condition()
+    # each item is a tuple (success, value), where value is either the
+    # frame or the exception raised
+    results = []
+    procs = []
+    state = {'stopped': False}
+
+    def register_attempt(proc):
+        """Keep track of a newly spawned FFmpeg process."""
+        with condition:
+            procs.append(proc)
+            if state['stopped']:
+                _kill_quietly(proc)
+        if register is not None:
+            register(proc)
+
+    def attempt(attempt_timestamp, attempt_opts):
+        """Extract a frame and report the result."""
+        try:
+            result = (True, _extract_frame_plain(
+                video_path, attempt_timestamp, attempt_opts,
+                register=register_attempt))
+        except Exception as err:  # pylint: disable=broad-except
+            result = (False, err)
+        with condition:
+            results.append(result)
+            condition.notify_all()
+
+    # the primary attempt is allowed to go on past the deadline while
+    # the hedge is running, but no longer than the hedge itself
+    attempts = [(timestamp, dict(opts, timeout=2 * opts['timeout'])),
+                (hedge_timestamp, opts)]
+    threads = []
+    try:
+        with condition:
+            for attempt_timestamp, attempt_opts in attempts:
+                thread = threading.Thread(
+                    target=attempt, args=(attempt_timestamp, attempt_opts))
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+                # wait for the deadline, or for a verdict
+                deadline = time.time() + opts['timeout']
+                while not results and time.time() < deadline:
+                    condition.wait(deadline - time.time())
+                if results and results[0][0]:
+                    return results[0][1]
+            # wait for a success, or for every attempt to fail
+            while True:
+                for success, value in results:
+                    if success:
+                        return value
+                if len(results) == len(threads):
+                    break
+                condition.wait()
+        errors = [value for _, value in results]
+        raise OSError("failed to extract frame at %.2f, and at %.2f "
+                      "instead:\n%s\n%s" %
+                      (timestamp, hedge_timestamp, errors[0], errors[1]))
+    finally:
+        with condition:
+            state['stopped'] = True
+            for proc in procs:
+                _kill_quietly(proc)
+        for thread in threads:
+            thread.join()
+
+
+# upper limit of inputs (hence simultaneously open decoders) handed to a
+# single ffmpeg process by iter_frames; ffmpeg decodes the first frame
+# of every input before configuring the filtergraph, so this also caps
+# the number of decoded frames held by ffmpeg at any time
+_MAX_FRAMES_PER_PROCESS = 16
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+_JPEG_SOI = b'\xff\xd8'
+
+# image codecs whose output streams can be split into frames on the fly
+_SPLITTABLE_CODECS = ('png', 'mjpeg')
+
+
+def iter_frames(video_path, timestamps, params=None):
+    """Extract video frames from a list of timestamps.
+
+    This is the batch counterpart of `extract_frame`: instead of
+    spawning one FFmpeg process per timestamp, all timestamps are
+    handled by a single FFmpeg invocation (see "Notes"), and frames are
+    yielded as soon as they are decoded.
+
+    Parameters
+    ----------
+    video_path : str
+        Path to the video file.
+    timestamps : list
+        List of timestamps in seconds (as nonnegative floats).
+    params : dict, optional
+        Optional parameters enclosed in a dict. Default is ``None``.
+        See the "Other Parameters" section for understood key/value
+        pairs.
+
+    Yields
+    ------
+    frame : Frame
+        Frames in the order of `timestamps`.
+
+    Raises
+    ------
+    OSError
+        If video file doesn't exist, ffmpeg binary doesn't exist or
+        fails to run, or ffmpeg generates fewer frames than requested
+        (possibly due to out of range timestamps).
+
+    Other Parameters
+    ----------------
+    ffmpeg_bin : str, optional
+        See the `ffmpeg_bin` parameter of `extract_frame`.
+    transport : {'image', 'rawvideo'}, optional
+        See the `transport` parameter of `extract_frame`.
+    codec : str, optional
+        See the `codec` parameter of `extract_frame`. Only ``'png'``
+        and ``'mjpeg'`` output can be split into frames on the fly; for
+        other codecs, this function falls back to calling
+        `extract_frame` once per timestamp.
+    size : tuple, optional
+        See the `size` parameter of `extract_frame`.
+    frame_by_frame : bool, optional
+        See the `frame_by_frame` parameter of `extract_frame`.
+    seek_margin : float, optional
+        See the `seek_margin` parameter of `extract_frame`. Hybrid
+        seeking is done with one FFmpeg process per frame, since every
+        frame is checked separately.
+    keyframes_only : bool, optional
+        See the `keyframes_only` parameter of `extract_frame`.
+    decode_profile : {'default', 'turbo'}, optional
+        See the `decode_profile` parameter of `extract_frame`.
+    lowres : int, optional
+        See the `lowres` parameter of `extract_frame`.
+    draft : bool, optional
+        See the `draft` parameter of `extract_frame`.
+    timeout : float, optional
+        See the `timeout` parameter of `extract_frame`. Within a batch,
+        the deadline applies to each frame in turn, except that the
+        first frame is allowed as much time as the whole batch, since
+        FFmpeg seeks every input before producing any output.
+    hedge_offset : float, optional
+        See the `hedge_offset` parameter of `extract_frame`. When a
+        batch runs past a deadline, the batch is abandoned, and its
+        remaining frames are extracted (and hedged) one by one.
+    byte_ranges : list, optional
+        List of tuples ``(offset, length)``, one for each timestamp,
+        estimating the region of the video file FFmpeg reads to
+        extract the frame. If specified, frames are extracted in the
+        order of their offsets (but still yielded in the order of
+        `timestamps`), and the kernel is advised to read ahead the
+        regions of the next batch while the current one is being
+        decoded (see ``posix_fadvise(2)``; only available with Python
+        3.3+ on some platforms), which turns random reads with cold
+        caches into mostly sequential ones on slow storage. Default is
+        ``None``.
+    frames_per_process : int, optional
+        Maximum number of timestamps handled by a single FFmpeg
+        process. Longer lists are split into consecutive batches of
+        this size. Default is 16.
+    jobs : int, optional
+        Number of FFmpeg processes to run concurrently. If larger than
+        1, timestamps are split into (at least) `jobs` batches, which
+        are processed by a bounded pool of worker threads; frames are
+        still yielded in the order of `timestamps`. Default is 1.
+
+    Notes
+    -----
+    Each timestamp becomes a separate input of the same file (with its
+    own seek), trimmed to a single frame; the trimmed streams are
+    concatenated in the filtergraph and written to stdout as one image
+    (or raw video) stream. Therefore the process startup cost is paid
+    once per batch, rather than once per frame. Note, however, that
+    every input still opens and probes the container, and sets up its
+    own demuxer and decoder, so these costs are still paid once per
+    frame. Seeking within a single input instead (e.g., by selecting
+    the frames at the timestamps) would mean decoding everything
+    between the timestamps, which for the sparse frames of a storyboard
+    costs far more than a container probe per frame.
+
+    Since frames are matched to timestamps by their order in the output
+    stream, a timestamp that produces no frame at all (e.g., one that is
+    out of range) shifts the remaining frames; this is detected at the
+    end of the batch and reported as an `OSError`.
+
+    """
+
+    if params is None:
+        params = {}
+    opts = _read_extraction_params(params)
+    frames_per_process = _read_param(params, 'frames_per_process',
+                                     _MAX_FRAMES_PER_PROCESS)
+    byte_ranges = _read_param(params, 'byte_ranges', None)
+    jobs = _read_param(params, 'jobs', 1)
+    if not (isinstance(jobs, int) and jobs > 0):
+        raise ValueError("jobs should be a positive integer, got %s" % jobs)
+
+    if not os.path.exists(video_path):
+        raise OSError("video file '%s' does not exist" % video_path)
+
+    if ((opts['transport'] == 'image' and
+         opts['codec'] not in _SPLITTABLE_CODECS)):
+        for timestamp in timestamps:
+            yield _extract_frame_hedged(video_path, timestamp, opts)
+        return
+
+    timestamps = list(timestamps)
+    # indices of timestamps in extraction order
+    order = list(range(len(timestamps)))
+    if byte_ranges is not None:
+        if len(byte_ranges) != len(timestamps):
+            raise ValueError("expected %d byte ranges, got %d" %
+                             (len(timestamps), len(byte_ranges)))
+        order.sort(key=lambda index: byte_ranges[index][0])
+    if jobs > 1:
+        # make sure there is enough batches to keep every worker busy
+        batch_size = int(math.ceil(len(timestamps) / jobs))
+        batch_size = max(1, min(batch_size, frames_per_process))
+    else:
+        batch_size = frames_per_process
+    batches = [[timestamps[index] for index in order[start:start + batch_size]]
+               for start in range(0, len(timestamps), batch_size)]
+    if byte_ranges is not None and batches:
+        batch_ranges = [
+            [byte_ranges[index] for index in order[start:start + batch_size]]
+            for start in range(0, len(timestamps), batch_size)]
+        # the first batch is read right away; hint anyway, so that the
+        # kernel reads whole regions rather than what FFmpeg asks for
+        _advise_willneed(video_path, batch_ranges[0])
+
+        def advise(index):
+            """Prepare for the batch after the one being started."""
+            if index + 1 < len(batch_ranges):
+                _advise_willneed(video_path, batch_ranges[index + 1])
+    else:
+        advise = None
+
+    def run_batch(batch, register=None):
+        """Extract frames from a batch of timestamps."""
+        return _iter_batch(video_path, batch, opts, register=register)
+
+    if jobs > 1 and len(batches) > 1:
+        frames = _iter_frames_parallel(batches, run_batch, jobs,
+                                       advise=advise)
+    else:
+        frames = _iter_frames_sequential(batches, run_batch, advise=advise)
+    if order == sorted(order):
+        for frame in frames:
+            yield frame
+        return
+    # restore the original order, holding frames extracted ahead of
+    # their turn
+    held_frames = {}
+    next_index = 0
+    for position, frame in enumerate(frames):
+        held_frames[order[position]] = frame
+        while next_index in held_frames:
+            yield held_frames.pop(next_index)
+            next_index += 1
+
+
+def batch_extract_frames(videos, params=None):
+    """Extract video frames from many videos at once.
+
+    This is the multi-video counterpart of `iter_frames`: frames of
+    different videos are combined in the same FFmpeg invocations (each
+    frame is a separate input anyway; see the "Notes" section of
+    `iter_frames`), so that the number of FFmpeg processes grows with
+    the total number of frames rather than with the number of
+    videos. This pays off for large numbers of short videos, where
+    process startup would otherwise dominate.
+
+    Parameters
+    ----------
+    videos : list
+        List of tuples ``(video_path, timestamps)``, where `timestamps`
+        is a list of timestamps in seconds.
+    params : dict, optional
+        Optional parameters enclosed in a dict. Default is ``None``.
+        See the "Other Parameters" section for understood key/value
+        pairs.
+
+    Returns
+    -------
+    frame_lists : list
+        One item for each video: either the list of frames extracted
+        from the video, in the order of its timestamps, or the
+        `OSError` explaining why frames could not be extracted, so that
+        one bad video doesn't take the others down.
+
+    Other Parameters
+    ----------------
+    ffmpeg_bin : str, optional
+        See the `ffmpeg_bin` parameter of `extract_frame`.
+    transport : {'image', 'rawvideo'}, optional
+        See the `transport` parameter of `extract_frame`.
+    codec : str, optional
+        See the `codec` parameter of `iter_frames`.
+    size : tuple, optional
+        See the `size` parameter of `extract_frame`. Frames of
+        different videos can only be combined if `size` is specified,
+        since they are concatenated into a single stream; otherwise,
+        every video is processed separately.
+    frame_by_frame : bool, optional
+        See the `frame_by_frame` parameter of `extract_frame`.
+    seek_margin : float, optional
+        See the `seek_margin` parameter of `iter_frames`.
+    keyframes_only : bool, optional
+        See the `keyframes_only` parameter of `extract_frame`.
+    decode_profile : {'default', 'turbo'}, optional
+        See the `decode_profile` parameter of `extract_frame`.
+    lowres : int, optional
+        See the `lowres` parameter of `extract_frame`.
+    draft : bool, optional
+        See the `draft` parameter of `extract_frame`.
+    timeout : float, optional
+        See the `timeout` parameter of `iter_frames`.
+    hedge_offset : float, optional
+        See the `hedge_offset` parameter of `iter_frames`.
+    frames_per_process : int, optional
+        See the `frames_per_process` parameter of `iter_frames`.
+    jobs : int, optional
+        See the `jobs` parameter of `iter_frames`.
+
+    Notes
+    -----
+    When FFmpeg fails on a batch combining several videos, the part of
+    the batch belonging to each video is retried separately, so that
+    the error is attributed to the right video.
+
+    """
+
+    if params is None:
+        params = {}
+    opts = _read_extraction_params(params)
+    frames_per_process = _read_param(params, 'frames_per_process',
+                                     _MAX_FRAMES_PER_PROCESS)
+    jobs = _read_param(params, 'jobs', 1)
+    if not (isinstance(jobs, int) and jobs > 0):
+        raise ValueError("jobs should be a positive integer, got %s" % jobs)
+
+    frame_lists = [[] for _ in videos]
+    # each input is a tuple (index of video, video path, timestamp)
+    groups = []
+    for index, (video_path, timestamps) in enumerate(videos):
+        if not os.path.exists(video_path):
+            frame_lists[index] = OSError("video file '%s' does not exist" %
+                                         video_path)
+            continue
+        groups.append([(index, video_path, timestamp)
+                       for timestamp in timestamps])
+    if opts['size'] is not None:
+        groups = [[item for group in groups for item in group]]
+    batches = [group[start:start + frames_per_process]
+               for group in groups
+               for start in range(0, len(group), frames_per_process)]
+
+    def run_batch(batch, register=None):
+        """Extract a batch, and attribute the frames (or the error).
+
+        Returns a list of tuples ``(index of video, frame or error)``.
+
+        """
+
+        video_paths = [video_path for _, video_path, _ in batch]
+        timestamps = [timestamp for _, _, timestamp in batch]
+        try:
+            if ((opts['transport'] == 'image' and
+                 opts['codec'] not in _SPLITTABLE_CODECS)):
+                # not splittable; see iter_frames
+                frames = [_extract_frame_hedged(video_path, timestamp, opts,
+                                                register=register)
+                          for video_path, timestamp
+                          in zip(video_paths, timestamps)]
+            else:
+                frames = list(_iter_batch(video_paths, timestamps, opts,
+                                          register=register))
+        except OSError as err:
+            indices = sorted(set(index for index, _, _ in batch))
+            if len(indices) == 1:
+                return [(indices[0], err)]
+            outcomes = []
+            for video_index in indices:
+                outcomes += run_batch([item for item in batch
+                                       if item[0] == video_index],
+                                      register=register)
+            return outcomes
+        return [(index, frame)
+                for (index, _, _), frame in zip(batch, frames)]
+
+    if jobs > 1 and len(batches) > 1:
+        outcomes = _iter_frames_parallel(batches, run_batch, jobs)
+    else:
+        outcomes = _iter_frames_sequential(batches, run_batch)
+    for index, outcome in outcomes:
+        if not isinstance(frame_lists[index], list):
+            # already failed
+            continue
+        if isinstance(outcome, Frame):
+            frame_lists[index].append(outcome)
+        else:
+            frame_lists[index] = outcome
+    return frame_lists
+
+
+_GRID_CELL_LOG_PATTERN = re.compile(
+    r'\[(?:showinfo@)?cell(?P<index>\d+) @ [^]]*\] n:')
+"""Pattern of the lines logged by the showinfo filter of a cell in
+`extract_frame_grid` for the frame it delivers (FFmpeg 7 prefixes the
+instance name with the filter name, earlier versions do not)."""
+
+
+def extract_frame_grid(video_path, timestamps, tile, params=None):
+    """Extract video frames and tile them into a grid, all in FFmpeg.
+
+    Frames are extracted as with `iter_frames` (in a single FFmpeg
+    process), scaled to `size`, padded with the spacing, and tiled into
+    a grid by FFmpeg's filters, so that only the composed image comes
+    back. The layout is the same as that of
+    ``storyboard.storyboard.tile_images`` with the same tile spacing
+    and no margins.
+
+    Parameters
+    ----------
+    video_path : str
+        Path to the video file.
+    timestamps : list
+        List of timestamps in seconds, one for each cell of the grid,
+        row by row.
+    tile : tuple
+        A tuple ``(cols, rows)``.
+    params : dict, optional
+        Optional parameters enclosed in a dict. Default is ``None``.
+        See the "Other Parameters" section for understood key/value
+        pairs.
+
+    Returns
+    -------
+    image : PIL.Image.Image
+        The composed grid, in RGB mode.
+
+    Raises
+    ------
+    OSError
+        If video file doesn't exist, ffmpeg binary doesn't exist or
+        fails to run, or ffmpeg generates no frame for some cell
+        (possibly due to out of range timestamps).
+
+    Other Parameters
+    ----------------
+    ffmpeg_bin : str, optional
+        See the `ffmpeg_bin` parameter of `extract_frame`.
+    size : tuple
+        Size of each cell of the grid. Required.
+    tile_spacing : tuple, optional
+        A tuple ``(hor, ver)`` specifying the horizontal and vertical
+        spacing between adjacent cells. Default is ``(0, 0)``.
+    background_color : color, optional
+        Color of the spacing, in any color format recognized by
+        Pillow. Default is ``'white'``.
+    frame_by_frame : bool, optional
+        See the `frame_by_frame` parameter of `extract_frame`. Hybrid
+        seeking (see `seek_margin`) is not supported, since it checks
+        every frame separately.
+    keyframes_only : bool, optional
+        See the `keyframes_only` parameter of `extract_frame`.
+    decode_profile : {'default', 'turbo'}, optional
+        See the `decode_profile` parameter of `extract_frame`.
+    lowres : int, optional
+        See the `lowres` parameter of `extract_frame`.
+    timeout : float, optional
+        Deadline for FFmpeg to produce each frame, in seconds; FFmpeg is
+        allowed as much time as all the frames together. Default is
+        ``None``.
+
+    """
+
+    if params is None:
+        params = {}
+    tile_spacing = _read_param(params, 'tile_spacing', (0, 0))
+    background_color = _read_param(params, 'background_color', 'white')
+    # hedging and hybrid seeking operate on individual frames
+    opts = _read_extraction_params(dict(params, transport='rawvideo',
+                                        seek_margin=None, hedge_offset=None))
+
+    if not os.path.exists(video_path):
+        raise OSError("video file '%s' does not exist" % video_path)
+    cols, rows = tile
+    if len(timestamps) != cols * rows:
+        raise ValueError("expected %d timestamps, got %d" %
+                         (cols * rows, len(timestamps)))
+
+    width, height = opts['size']
+    hor_spacing, ver_spacing = tile_spacing
+    grid_size = (width * cols + hor_spacing * (cols - 1),
+                 height * rows + ver_spacing * (rows - 1))
+    # pad in RGB, so that the spacing is exactly the background color
+    color = '0x%02X%02X%02X' % ImageColor.getrgb(background_color)[:3]
+
+    ffmpeg_args = [opts['ffmpeg_bin'], '-hide_banner']
+    filters = []
+    # the tile filter flushes a partial grid when inputs run dry, so
+    # every cell logs its frame through a named showinfo filter, to tell
+    # whether it has one
+    for index, timestamp in enumerate(timestamps):
+        if opts['frame_by_frame']:
+            ffmpeg_args += _input_args(opts)
+            ffmpeg_args += ['-i', video_path]
+            filters.append('[%d:v:0]trim=start=%s,trim=end_frame=1,'
+                           'showinfo@cell%d[v%d]' %
+                           (index, timestamp, index, index))
+        else:
+            ffmpeg_args += _input_args(opts, timestamp)
+            ffmpeg_args += ['-i', video_path]
+            filters.append('[%d:v:0]trim=end_frame=1,showinfo@cell%d[v%d]' %
+                           (index, index, index))
+    # every cell carries the spacing to its right and bottom, which is
+    # cropped off the last column and row of the grid
+    output_chain = ','.join([
+        'concat=n=%d:v=1:a=0' % len(timestamps),
+        'setpts=N',
+        _scale_filter(opts['size']),
+        'format=rgb24',
+        'pad=%d:%d:0:0:color=%s' % (width + hor_spacing,
+                                    height + ver_spacing, color),
+        'tile=%dx%d' % (cols, rows),
+        'crop=%d:%d:0:0' % grid_size,
+    ])
+    filters.append('%s%s[out]' % (
+        ''.join('[v%d]' % index for index in range(len(timestamps))),
+        output_chain))
+    ffmpeg_args += [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[out]',
+        '-vsync', 'passthrough',
+        '-vframes', '1',
+    ]
+    ffmpeg_args += _output_args(opts)
+
+    grid_opts = dict(opts, size=grid_size)
+    if opts['timeout'] is not None:
+        grid_opts['timeout'] = opts['timeout'] * len(timestamps)
+    log = []
+    frames = list(_run_ffmpeg(ffmpeg_args, timestamps[:1], grid_opts,
+                              log=log))
+    delivered = set(int(match.group('index')) for match in
+                    _GRID_CELL_LOG_PATTERN.finditer(log[0]))
+    missing = [timestamp for index, timestamp in enumerate(timestamps)
+               if index not in delivered]
+    if missing:
+        msg = ("ffmpeg generated no frame at time %s "
+               "(timestamps might be out of range)\n"
+               "ffmpeg error message:\n%s" %
+               (', '.join('%.2f' % t for t in missing), log[0]))
+        raise OSError(msg)
+    return frames[0].image
+
+
+def render_audio_strip(audio_path, size, params=None):
+    """Render a waveform or spectrogram of an audio file in FFmpeg.
+
+    The whole strip, including the cover art (if any) to its left, is
+    rendered by a single FFmpeg process, in a single pass over the
+    audio.
+
+    Parameters
+    ----------
+    audio_path : str
+        Path to the audio (or video) file. The first audio stream is
+        rendered.
+    size : tuple
+        A tuple ``(width, height)``, the size of the strip, cover art
+        included.
+    params : dict, optional
+        Optional parameters enclosed in a dict. Default is ``None``.
+        See the "Other Parameters" section for understood key/value
+        pairs.
+
+    Returns
+    -------
+    image : PIL.Image.Image
+        The strip, in RGB mode.
+
+    Raises
+    ------
+    OSError
+        If the audio file doesn't exist, or FFmpeg fails.
+
+    Other Parameters
+    ----------------
+    ffmpeg_bin : str, optional
+        See the `ffmpeg_bin` parameter of `extract_frame`.
+    mode : {'waveform', 'spectrogram'}, optional
+        What to render, with FFmpeg's ``showwavespic`` or
+        ``showspectrumpic`` filter respectively. Default is
+        ``'waveform'``.
+    cover : bool, optional
+        Whether to put the first video stream (usually the attached
+        picture of an audio file) into a square of the height of the
+        strip, on the left. Default is ``False``.
+    spacing : int, optional
+        Horizontal spacing between the cover art and the rest of the
+        strip. Default is 0.
+    background_color : color, optional
+        Color of the background of the waveform and around the cover
+        art, in any color format recognized by Pillow. Default is
+        ``'white'``.
+    foreground_color : color, optional
+        Color of the waveform. Default is ``'black'``.
+    timeout : float, optional
+        Deadline for FFmpeg, in seconds. Default is ``None``.
+
+    """
+
+    if params is None:
+        params = {}
+    mode = _read_param(params, 'mode', 'waveform')
+    cover = _read_param(params, 'cover', False)
+    spacing = _read_param(params, 'spacing', 0)
+    background_color = _read_param(params, 'background_color', 'white')
+    foreground_color = _read_param(params, 'foreground_color', 'black')
+    opts = _read_extraction_params(dict(params, transport='rawvideo',
+                                        size=size))
+
+    if not os.path.exists(audio_path):
+        raise OSError("audio file '%s' does not exist" % audio_path)
+    if mode not in ('waveform', 'spectrogram'):
+        raise ValueError("unrecognized audio visualization mode '%s'" % mode)
+    width, height = opts['size']
+    if cover and height + spacing >= width:
+        # no room left for the audio
+        cover = False
+    strip_width = width - height - spacing if cover else width
+    background = '0x%02X%02X%02X' % ImageColor.getrgb(background_color)[:3]
+    foreground = '0x%02X%02X%02X' % ImageColor.getrgb(foreground_color)[:3]
+
+    # overlaying and padding are done in RGB, so that the background is
+    # exactly the background color, as in extract_frame_grid
+    if mode == 'waveform':
+        # the waveform is drawn on a transparent canvas
+        filters = [
+            '[0:a:0]aformat=channel_layouts=mono,'
+            'showwavespic=s=%dx%d:colors=%s[wave]' % (
+                strip_width, height, foreground),
+            'color=c=%s:s=%dx%d,format=rgba[bg]' % (
+                background, strip_width, height),
+            '[bg][wave]overlay=shortest=1:format=rgb,format=rgb24[strip]',
+        ]
+    else:
+        filters = ['[0:a:0]showspectrumpic=s=%dx%d:legend=0,'
+                   'format=rgb24[strip]' % (strip_width, height)]
+    if cover:
+        filters += [
+            '[0:v:0]scale=%d:%d:force_original_aspect_ratio=decrease:'
+            'flags=lanczos,format=rgb24,'
+            'pad=%d:%d:(%d-iw)/2:(oh-ih)/2:color=%s,setsar=1[cover]' % (
+                height, height, height + spacing, height, height,
+                background),
+            '[cover][strip]hstack=inputs=2[out]',
+        ]
+        output_label = '[out]'
+    else:
+        output_label = '[strip]'
+
+    ffmpeg_args = [opts['ffmpeg_bin'], '-hide_banner', '-i', audio_path,
+                   '-filter_complex', ';'.join(filters),
+                   '-map', output_label, '-frames:v', '1']
+    ffmpeg_args += _output_args(opts)
+    frames = list(_run_ffmpeg(ffmpeg_args, [0.0], opts))
+    return frames[0].image
+
+
+_STREAM_SAMPLE_INTERVAL = 1.0
+"""Initial sampling interval (in seconds) for streams of unknown duration."""
+
+_SHOWINFO_LOG_PATTERN = re.compile(
+    r'config in time_base: (?P<num>\d+)/(?P<den>\d+)|'
+    r'\bn:\s*\d+\s+pts:\s*(?P<pts>-?\d+)')
+"""Pattern of the time base and frame lines logged by the showinfo
+filter."""
+
+
+def sample_stream_frames(chunks, count, params=None):
+    """Sample equally spaced frames from a video stream in one pass.
+
+    Unlike the other routines of this module, which seek into a file,
+    this feeds the video to a single FFmpeg process through its stdin
+    and picks frames as they go by, so that the video may come from a
+    pipe, and is read and decoded exactly once, front to back.
+
+    The video is divided into intervals, and one sample is taken from
+    each: the first frame at or after the middle of the interval, or,
+    if there is none (as in a last interval cut short by the end of
+    the video), the first frame of the interval. Samples are labeled
+    with their actual timestamps, counted from the first frame. If the
+    duration of the video is known, there are N intervals, so that the
+    samples are the frames at positions 1/2N, 3/2N, 5/2N, ... ,
+    (2N-1)/2N of the video, as with ``StoryBoard.gen_frames``.
+    Otherwise, intervals have a fixed length, which is doubled (and
+    every other sample dropped) whenever more than 2N samples are held,
+    so that memory usage is bounded regardless of the length of the
+    video; the N samples closest to the equally spaced positions over
+    the length found in the end are returned.
+
+    Parameters
+    ----------
+    chunks : iterable
+        The content of the video, as an iterable of bytes objects (see
+        ``storyboard.metadata.Video.iter_stream``). It is always
+        exhausted, even if FFmpeg fails or stops reading early, so that
+        side effects of the iteration (such as hashing) cover the whole
+        stream.
+    count : int
+        Number of frames to sample.
+    params : dict, optional
+        Optional parameters enclosed in a dict. Default is ``None``.
+        See the "Other Parameters" section for understood key/value
+        pairs.
+
+    Returns
+    -------
+    frames : list
+        `count` frames in timestamp order (some of them might be copies
+        of one another if the video has fewer samples to offer, in
+        which case their timestamps coincide).
+    duration : float
+        The duration of the video if given, or the duration estimated
+        from the number of intervals otherwise (rounded up to a whole
+        number of intervals).
+
+    Raises
+    ------
+    OSError
+        If FFmpeg fails, or generates no frame at all.
+
+    Other Parameters
+    ----------------
+    ffmpeg_bin : str, optional
+        See the `ffmpeg_bin` parameter of `extract_frame`.
+    size : tuple
+        Size of the frames. Required, since frames are transported as
+        raw video.
+    duration : float, optional
+        Duration of the video in seconds, if known in advance. Default
+        is ``None``.
+    decode_profile : {'default', 'turbo'}, optional
+        See the `decode_profile` parameter of `extract_frame`.
+    lowres : int, optional
+        See the `lowres` parameter of `extract_frame`.
+
+    """
+
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+
+    if params is None:
+        params = {}
+    opts = _read_extraction_params(dict(params, transport='rawvideo'))
+    duration = _read_param(params, 'duration', None)
+    if not (isinstance(count, int) and count > 0):
+        raise ValueError("count should be a positive integer, got %s" %
+                         count)
+
+    if duration is not None and duration > 0:
+        interval = duration / count
+    else:
+        duration = None
+        interval = _STREAM_SAMPLE_INTERVAL
+    # the first frame of every interval, counted from the first frame,
+    # and the first frame at or after its middle, unless that's the
+    # same frame
+    start = 'floor(t/%r)*%r' % (interval, interval)
+    select_expr = ('isnan(prev_selected_t)+'
+                   'lt(floor(prev_selected_t/%r),floor(t/%r))+'
+                   'gte(t-%s,%r)*lt(prev_selected_t-%s,%r)' % (
+                       interval, interval, start, interval / 2, start,
+                       interval / 2))
+    ffmpeg_args = [opts['ffmpeg_bin'], '-hide_banner', '-nostats',
+                   # the showinfo filter logs at the info level
+                   '-loglevel', 'info']
+    ffmpeg_args += _input_args(opts)
+    ffmpeg_args += [
+        '-i', 'pipe:0',
+        '-map', '0:v:0',
+        # the showinfo filter logs the timestamp of every selected frame
+        # before it is written out
+        '-vf', "setpts=PTS-STARTPTS,select='%s',showinfo,%s,setsar=1" % (
+            select_expr, _scale_filter(opts['size'])),
+        '-vsync', 'passthrough',
+    ]
+    ffmpeg_args += _output_args(opts)
+
+    proc = subprocess.Popen(ffmpeg_args, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # stdin and stderr are serviced by threads, while frames are read
+    # from stdout in this one
+    feed_errors = []
+    # timestamps of the selected frames, in output order, parsed from
+    # stderr; None marks the end of the log
+    timestamps = collections.deque()
+    available = threading.Semaphore(0)
+    # the tail of the log, for error messages
+    ffmpeg_err = collections.deque(maxlen=20)
+
+    def feed():
+        """Pipe the stream into FFmpeg, and drain it in any case."""
+        writing = True
+        try:
+            for chunk in chunks:
+                if not writing:
+                    continue
+                try:
+                    proc.stdin.write(chunk)
+                except (IOError, OSError):
+                    # FFmpeg is gone; its exit status will tell
+                    writing = False
+        except Exception as err:  # pylint: disable=broad-except
+            feed_errors.append(err)
+            _kill_quietly(proc)
+        finally:
+            try:
+                proc.stdin.close()
+            except (IOError, OSError):
+                pass
+
+    def parse_log():
+        """Parse timestamps off FFmpeg's log."""
+        time_base = None
+        for line in iter(proc.stderr.readline, b''):
+            line = line.decode('utf-8', 'ignore')
+            match = _SHOWINFO_LOG_PATTERN.search(line)
+            if match is None:
+                ffmpeg_err.append(line)
+            elif match.group('pts') is None:
+                if time_base is None:
+                    time_base = (int(match.group('num')) /
+                                 int(match.group('den')))
+            elif time_base is not None:
+                # computed as in the select filter, so that frames fall
+                # into the same intervals
+                timestamps.append(int(match.group('pts')) * time_base)
+                available.release()
+        timestamps.append(None)
+        available.release()
+
+    threads = [threading.Thread(target=feed),
+               threading.Thread(target=parse_log)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    # index of interval -> (timestamp, image)
+    samples = {}
+    stride = 1
+    ticks = 0
+    completed = False
+    try:
+        while True:
+            image = _read_rawvideo(proc.stdout, opts['size'])
+            if image is None:
+                break
+            available.acquire()
+            timestamp = timestamps.popleft()
+            if timestamp is None:
+                raise OSError("ffmpeg did not report the timestamp of a "
+                              "frame of the video stream")
+            tick = int(math.floor(timestamp / interval))
+            ticks = max(ticks, tick + 1)
+            if duration is not None and tick >= count:
+                # past the given duration
+                continue
+            if tick % stride != 0:
+                continue
+            # a later frame of the same interval is past its middle
+            samples[tick] = (timestamp, image)
+            if len(samples) > 2 * count:
+                stride *= 2
+                samples = dict((tick, sample)
+                               for tick, sample in samples.items()
+                               if tick % stride == 0)
+        completed = True
+    finally:
+        if proc.poll() is None and (feed_errors or not completed):
+            _kill_quietly(proc)
+        for thread in threads:
+            thread.join()
+        proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+    if feed_errors:
+        raise OSError("failed to read video stream: %s" % feed_errors[0])
+    if proc.returncode != 0 or not samples:
+        msg = ("ffmpeg failed to sample frames from video stream\n"
+               "ffmpeg error message:\n%s" % ''.join(ffmpeg_err).strip())
+        raise OSError(msg)
+
+    if duration is None:
+        duration = ticks * interval
+    samples = sorted(samples.values(), key=lambda sample: sample[0])
+    frames = []
+    used = set()
+    for i in range(count):
+        position = duration / count * (i + 1/2)
+        timestamp, image = min(
+            samples, key=lambda sample: abs(sample[0] - position))
+        if timestamp in used:
+            image = image.copy()
+        used.add(timestamp)
+        frames.append(Frame(timestamp, image))
+    return frames, duration
+
+
+_SCENE_LOG_PATTERN = re.compile(
+    r'pts_time:\s*(?P<pts_time>\S+)|lavfi\.scene_score=(?P<score>\S+)')
+"""Pattern of the lines logged by the metadata filter in
+`select_scene_frames`."""
+
+
+def select_scene_frames(video_path, count, params=None):
+    """Pick frames at scene changes in a single pass over the video.
+
+    A single FFmpeg process decodes the video once, front to back, and
+    passes on the frames whose scene change score (the ``scene``
+    variable of FFmpeg's ``select`` filter, between 0 and 1) reaches
+    `threshold`, plus regular fallback frames, so that no stretch of the
+    video goes without candidates. Candidates are consumed as they
+    stream in, each with its score: the video is divided into `count`
+    equal sections, and for each section only the strongest scene
+    change is kept, or, for sections without any, the fallback frame
+    closest to the middle of the section. The picks are thus spread
+    across the timeline, and at most two frames per section are held in
+    memory at any time.
+
+    Parameters
+    ----------
+    video_path : str
+        Path to the video file.
+    count : int
+        Number of frames to pick.
+    params : dict, optional
+        Optional parameters enclosed in a dict. Default is ``None``.
+        See the "Other Parameters" section for understood key/value
+        pairs.
+
+    Returns
+    -------
+    frames : list
+        `count` frames in timestamp order. Timestamps are relative to
+        the first frame of the video. Sections without any candidate
+        (e.g., past the actual end of the video) get a copy of the
+        nearest pick.
+    scores : list
+        The scene change score of each frame, or ``None`` for fallback
+        frames (and copies).
+
+    Raises
+    ------
+    OSError
+        If the video file doesn't exist, or FFmpeg fails, or generates
+        no frame at all.
+
+    Other Parameters
+    ----------------
+    ffmpeg_bin : str, optional
+        See the `ffmpeg_bin` parameter of `extract_frame`.
+    size : tuple
+        Size of the frames. Required. Scene change scores are computed
+        on frames of this size too, which is a lot cheaper than at full
+        resolution.
+    duration : float
+        Duration of the video in seconds. Required.
+    threshold : float, optional
+        Minimum score of a scene change. Default is 0.3.
+    decode_profile : {'default', 'turbo'}, optional
+        See the `decode_profile` parameter of `extract_frame`.
+    lowres : int, optional
+        See the `lowres` parameter of `extract_frame`.
+
+    """
+
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+
+    if params is None:
+        params = {}
+    opts = _read_extraction_params(dict(params, transport='rawvideo'))
+    duration = _read_param(params, 'duration', None)
+    threshold = _read_param(params, 'threshold', 0.3)
+    if not os.path.exists(video_path):
+        raise OSError("video file '%s' does not exist" % video_path)
+    if not (isinstance(count, int) and count > 0):
+        raise ValueError("count should be a positive integer, got %s" %
+                         count)
+    if duration is None or duration <= 0:
+        raise ValueError("duration should be positive, got %s" % duration)
+    if not 0 <= threshold <= 1:
+        raise ValueError("threshold should be between 0 and 1, got %s" %
+                         threshold)
+
+    section = duration / count
+    # a fallback frame every half section guarantees a candidate within
+    # a quarter section of the middle of every section
+    select_expr = ('gte(scene,%r)+isnan(prev_selected_t)+'
+                   'gte(t-prev_selected_t,%r)' % (threshold, section / 2))
+    ffmpeg_args = [opts['ffmpeg_bin'], '-hide_banner', '-nostats',
+                   # the metadata filter logs at the info level
+                   '-loglevel', 'info']
+    ffmpeg_args += _input_args(opts)
+    ffmpeg_args += [
+        '-i', video_path,
+        '-map', '0:v:0',
+        # scores are computed after scaling; the metadata filter logs
+        # the timestamp and score of every selected frame before it is
+        # written out
+        '-vf', "%s,setsar=1,setpts=PTS-STARTPTS,select='%s',"
+               "metadata=mode=print:key=lavfi.scene_score" % (
+                   _scale_filter(opts['size']), select_expr),
+        '-vsync', 'passthrough',
+    ]
+    ffmpeg_args += _output_args(opts)
+
+    proc = subprocess.Popen(ffmpeg_args,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # (timestamp, score) of the selected frames, in output order, parsed
+    # from stderr by a thread; None marks the end of the log
+    candidates = collections.deque()
+    available = threading.Semaphore(0)
+    # the tail of the log, for error messages
+    ffmpeg_err = collections.deque(maxlen=20)
+
+    def parse_log():
+        """Parse timestamps and scores off FFmpeg's log."""
+        timestamp = None
+        for line in iter(proc.stderr.readline, b''):
+            line = line.decode('utf-8', 'ignore')
+            match = _SCENE_LOG_PATTERN.search(line)
+            if match is None:
+                ffmpeg_err.append(line)
+            elif match.group('pts_time') is not None:
+                timestamp = float(match.group('pts_time'))
+            elif timestamp is not None:
+                candidates.append((timestamp, float(match.group('score'))))
+                timestamp = None
+                available.release()
+        candidates.append(None)
+        available.release()
+
+    thread = threading.Thread(target=parse_log)
+    thread.daemon = True
+    thread.start()
+
+    # section index -> (score, timestamp, image) of the strongest scene
+    # change, and (distance to the middle, timestamp, image) of the
+    # fallback frame closest to the middle
+    changes = {}
+    fallbacks = {}
+    try:
+        while True:
+            image = _read_rawvideo(proc.stdout, opts['size'])
+            if image is None:
+                break
+            available.acquire()
+            candidate = candidates.popleft()
+            if candidate is None:
+                raise OSError("ffmpeg did not report the scene change score "
+                              "of a frame of '%s'" % video_path)
+            timestamp, score = candidate
+            index = min(int(timestamp / section), count - 1)
+            if score >= threshold:
+                if index not in changes or score > changes[index][0]:
+                    changes[index] = (score, timestamp, image)
+            elif index not in changes:
+                distance = abs(timestamp - section * (index + 1/2))
+                if index not in fallbacks or distance < fallbacks[index][0]:
+                    fallbacks[index] = (distance, timestamp, image)
+            if index in changes:
+                # fallbacks are no longer needed
+                fallbacks.pop(index, None)
+        proc.wait()
+    finally:
+        if proc.returncode is None:
+            _kill_quietly(proc)
+            proc.wait()
+        thread.join()
+        proc.stdout.close()
+        proc.stderr.close()
+
+    if proc.returncode != 0 or not (changes or fallbacks):
+        msg = ("ffmpeg failed to select frames from '%s'\n"
+               "ffmpeg error message:\n%s" %
+               (video_path, ''.join(ffmpeg_err).strip()))
+        raise OSError(msg)
+
+    picks = {}
+    for index, (score, timestamp, image) in changes.items():
+        picks[index] = (timestamp, image, score)
+    for index, (_, timestamp, image) in fallbacks.items():
+        picks[index] = (timestamp, image, None)
+    frames = []
+    scores = []
+    for index in range(count):
+        if index in picks:
+            timestamp, image, score = picks[index]
+        else:
+            nearest = min(picks, key=lambda pick: abs(pick - index))
+            timestamp, image, _ = picks[nearest]
+            image = image.copy()
+            score = None
+        frames.append(Frame(timestamp, image))
+        scores.append(score)
+    return frames, scores
+
+
+_SIGNATURE_SIZE = (32, 18)
+"""Size of the grayscale signatures compared by `screen_frames`."""
+
+
+def screen_frames(frames, params=None):
+    """Flag uninformative frames: black, blank, or duplicate ones.
+
+    Every frame is reduced to a tiny signature, and the mean and
+    standard deviation of its luma, as well as its mean absolute luma
+    difference from the signature of the previous frame, are computed
+    on the signatures: for the whole batch at once with NumPy (see
+    ``storyboard.framebatch.FrameBatch``) if it is installed, or frame
+    by frame with Pillow's C routines otherwise (where the luma is
+    rounded to integers, which may tip frames right at the thresholds
+    the other way). The cost is thus a small fraction of that of
+    extracting the frames in the first place, regardless of their
+    size.
+
+    Parameters
+    ----------
+    frames : list
+        ``Frame`` objects, e.g., the frames of a storyboard in order.
+    params : dict, optional
+        Optional parameters enclosed in a dict. Default is ``None``.
+        See the "Other Parameters" section for understood key/value
+        pairs.
+
+    Returns
+    -------
+    verdicts : list
+        For each frame, ``None`` if it passes, or the reason it is
+        rejected: ``'black'``, ``'blank'`` (uniform, e.g., a fade to
+        white or a test card), or ``'duplicate'`` (nearly identical to
+        the previous frame), the first that applies in this order. The
+        first frame is never a duplicate.
+
+    Other Parameters
+    ----------------
+    black_threshold : float, optional
+        Maximum mean luma (from 0 to 255) of a black frame. Default is
+        12.
+    blank_threshold : float, optional
+        Maximum standard deviation of the luma of a blank frame.
+        Default is 4.
+    duplicate_threshold : float, optional
+        Maximum mean absolute luma difference between the signatures of
+        a duplicate frame and of the previous frame. Default is 2.
 
     """
 
     if params is None:
         params = {}
-    if 'ffmpeg_bin' in params and params['ffmpeg_bin'] is not None:
-        ffmpeg_bin = params['ffmpeg_bin']
+    black_threshold = _read_param(params, 'black_threshold', 12)
+    blank_threshold = _read_param(params, 'blank_threshold', 4)
+    duplicate_threshold = _read_param(params, 'duplicate_threshold', 2)
+
+    # scaling down first spares converting all the pixels
+    signatures = [Frame(frame.timestamp,
+                        frame.image.resize(_SIGNATURE_SIZE, Image.BILINEAR))
+                  for frame in frames]
+    if not signatures:
+        return []
+    try:
+        # imported here, since storyboard.framebatch imports this module
+        from storyboard.framebatch import FrameBatch
+    except ImportError:
+        # NumPy is not installed
+        FrameBatch = None  # pylint: disable=invalid-name
+    if FrameBatch is not None:
+        batch = FrameBatch.from_frames(signatures)
+        means = batch.mean_luma().tolist()
+        stddevs = batch.luma_std().tolist()
+        diffs = batch.mean_abs_diff(params={'stride': 1}).tolist()
     else:
-        ffmpeg_bin, _ = fflocate.guess_bins()
-    codec = _read_param(params, 'codec', 'png')
-    frame_by_frame = (params['frame_by_frame'] if 'frame_by_frame' in params
-                      else False)
+        lumas = [signature.image.convert('L') for signature in signatures]
+        stats = [ImageStat.Stat(luma) for luma in lumas]
+        means = [stat.mean[0] for stat in stats]
+        stddevs = [stat.stddev[0] for stat in stats]
+        diffs = [ImageStat.Stat(ImageChops.difference(luma, previous)).mean[0]
+                 for previous, luma in zip(lumas, lumas[1:])]
+    # the first frame has no previous frame
+    diffs = [None] + diffs
+
+    verdicts = []
+    for mean, stddev, diff in zip(means, stddevs, diffs):
+        if mean <= black_threshold:
+            verdict = 'black'
+        elif stddev <= blank_threshold:
+            verdict = 'blank'
+        elif diff is not None and diff <= duplicate_threshold:
+            verdict = 'duplicate'
+        else:
+            verdict = None
+        verdicts.append(verdict)
+    return verdicts
+
+
+_LAPLACIAN_PARTS = (
+    ImageFilter.Kernel((3, 3), (0, 1, 0, 1, -4, 1, 0, 1, 0), scale=4),
+    ImageFilter.Kernel((3, 3), (0, -1, 0, -1, 4, -1, 0, -1, 0), scale=4),
+)
+"""Kernels of the positive and negative parts of the Laplacian, scaled
+down so that neither clips (8-bit Laplacians range from -1020 to
+1020)."""
+
+
+def find_sharpest_frames(video_path, timestamps, params=None):
+    """Find the sharpest frame around each of the given timestamps.
+
+    For each timestamp, a single FFmpeg process decodes `candidates`
+    frames spread evenly over a window centered on the timestamp (the
+    first frames at or after the middles of equal steps of the window),
+    at a reduced size, and the candidates are scored by the variance of
+    their Laplacian (computed by Pillow), which drops with motion blur,
+    defocus, and cross-fades. Only the timestamps of the winners are
+    returned, so that the frames can then be extracted at full size
+    (e.g., with `iter_frames`) without keeping the candidates around.
+    The timestamps are the actual timestamps of the candidates, so that
+    the frame extracted is the one scored, except that a timestamp is
+    kept as is unless a candidate is sharper than the one closest to it
+    (with an odd number of candidates, the frame at the timestamp).
+
+    Parameters
+    ----------
+    video_path : str
+        Path to the video file.
+    timestamps : list
+        Centers of the windows, in seconds.
+    params : dict, optional
+        Optional parameters enclosed in a dict. Default is ``None``.
+        See the "Other Parameters" section for understood key/value
+        pairs.
+
+    Returns
+    -------
+    timestamps : list
+        Timestamp of the sharpest candidate in each window (see
+        above). If the candidates of a window cannot be decoded (e.g.,
+        because the window extends beyond the end of the video), the
+        timestamp is kept.
+    scores : list
+        The Laplacian variance of each winner, or ``None`` for windows
+        whose candidates cannot be decoded.
+
+    Raises
+    ------
+    OSError
+        If the video file doesn't exist.
+
+    Other Parameters
+    ----------------
+    ffmpeg_bin : str, optional
+        See the `ffmpeg_bin` parameter of `extract_frame`.
+    size : tuple
+        Size the candidates are scored at. Required.
+    candidates : int, optional
+        Number of candidates per window. Default is 5.
+    window : float, optional
+        Length of the windows in seconds. Default is 1.0.
+    decode_profile : {'default', 'turbo'}, optional
+        See the `decode_profile` parameter of `extract_frame`.
+    lowres : int, optional
+        See the `lowres` parameter of `extract_frame`.
+    timeout : float, optional
+        Deadline for FFmpeg to produce each candidate, in seconds.
+        Default is ``None``.
+
+    """
 
+    if params is None:
+        params = {}
+    opts = _read_extraction_params(dict(params, transport='rawvideo'))
+    candidates = _read_param(params, 'candidates', 5)
+    window = _read_param(params, 'window', 1.0)
     if not os.path.exists(video_path):
         raise OSError("video file '%s' does not exist" % video_path)
+    if not (isinstance(candidates, int) and candidates > 0):
+        raise ValueError("candidates should be a positive integer, got %s" %
+                         candidates)
+    if window <= 0:
+        raise ValueError("window should be positive, got %s" % window)
 
-    ffmpeg_args = [ffmpeg_bin]
-    if frame_by_frame:
-        # output seeking
+    step = window / candidates
+    # the first frame at or after the middle of every step of the
+    # window; after input seeking, t counts from the seek point, and
+    # the showinfo filter logs the timestamp of every candidate
+    select_expr = ('gte(t,%r)*(isnan(prev_selected_t)+'
+                   'gt(floor((t-%r)/%r),floor((prev_selected_t-%r)/%r)))' %
+                   (step / 2, step / 2, step, step / 2, step))
+    sharpest_timestamps = []
+    scores = []
+    for timestamp in timestamps:
+        # the window is shifted right at the start of the video
+        start = max(timestamp - window / 2, 0)
+        # nominal timestamps, only for error messages
+        nominal_timestamps = [start + step * (i + 1/2)
+                              for i in range(candidates)]
+        ffmpeg_args = [opts['ffmpeg_bin'], '-hide_banner']
+        ffmpeg_args += _input_args(opts, start)
         ffmpeg_args += [
             '-i', video_path,
-            '-ss', str(timestamp),
+            '-map', '0:v:0',
+            '-vf', "select='%s',showinfo,%s,setsar=1" % (
+                select_expr, _scale_filter(opts['size'])),
+            '-vsync', 'passthrough',
+            '-frames:v', str(candidates),
         ]
+        ffmpeg_args += _output_args(opts)
+        log = []
+        try:
+            variances = [_laplacian_variance(frame.image)
+                         for frame in _run_ffmpeg(ffmpeg_args,
+                                                  nominal_timestamps, opts,
+                                                  log=log)]
+        except OSError:
+            # _ExtractionTimeout included
+            sharpest_timestamps.append(timestamp)
+            scores.append(None)
+            continue
+        candidate_timestamps = []
+        time_base = None
+        for line in log[0].splitlines():
+            match = _SHOWINFO_LOG_PATTERN.search(line)
+            if match is None:
+                continue
+            if match.group('pts') is None:
+                if time_base is None:
+                    time_base = (int(match.group('num')) /
+                                 int(match.group('den')))
+            elif time_base is not None:
+                candidate_timestamps.append(
+                    start + int(match.group('pts')) * time_base)
+        if len(candidate_timestamps) != len(variances):
+            # can't tell which frame is which
+            sharpest_timestamps.append(timestamp)
+            scores.append(None)
+            continue
+        scored = list(zip(candidate_timestamps, variances))
+        # ties (e.g., static scenes) go to the candidate closest to the
+        # center, in which case the frame isn't moved at all
+        sharpest_timestamp, score = max(
+            scored, key=lambda item: (item[1], -abs(item[0] - timestamp)))
+        if sharpest_timestamp == min(
+                candidate_timestamps,
+                key=lambda candidate: abs(candidate - timestamp)):
+            sharpest_timestamp = timestamp
+        sharpest_timestamps.append(sharpest_timestamp)
+        scores.append(score)
+    return sharpest_timestamps, scores
+
+
+def _laplacian_variance(image):
+    """Return the variance of the Laplacian of the luma of an image.
+
+    The Laplacian is not clipped (up to the rounding of the scaled down
+    kernels), and the edges of the image, where it is undefined, are
+    left out.
+
+    """
+
+    luma = image.convert('L')
+    interior = (1, 1, luma.size[0] - 1, luma.size[1] - 1)
+    positive, negative = [ImageStat.Stat(luma.filter(kernel).crop(interior))
+                          for kernel in _LAPLACIAN_PARTS]
+    count = positive.count[0]
+    # the parts are never both nonzero, so the square of their
+    # difference is the sum of their squares
+    mean = (positive.sum[0] - negative.sum[0]) / count
+    variance = (positive.sum2[0] + negative.sum2[0]) / count - mean ** 2
+    # undo the scaling of the kernels
+    return 16 * variance
+
+
+def _read_extraction_params(params):
+    """Read parameters shared by `extract_frame` and `iter_frames`.
+
+    Returns
+    -------
+    opts : dict
+        A dict with all the understood keys present, defaults filled in
+        and values validated. It is a valid `params` argument to
+        `extract_frame`.
+
+    """
+
+    if params is None:
+        params = {}
+    opts = {}
+    if 'ffmpeg_bin' in params and params['ffmpeg_bin'] is not None:
+        opts['ffmpeg_bin'] = params['ffmpeg_bin']
     else:
-        # input seeking
-        ffmpeg_args += [
-            '-ss', str(timestamp),
-            '-i', video_path,
-        ]
+        opts['ffmpeg_bin'], _ = fflocate.guess_bins()
+    opts['transport'] = _read_param(params, 'transport', 'image')
+    opts['codec'] = _read_param(params, 'codec', 'png')
+    opts['size'] = _read_param(params, 'size', None)
+    opts['frame_by_frame'] = _read_param(params, 'frame_by_frame', False)
+    opts['seek_margin'] = _read_param(params, 'seek_margin', None)
+    opts['keyframes_only'] = _read_param(params, 'keyframes_only', False)
+    opts['decode_profile'] = _read_param(params, 'decode_profile', 'default')
+    opts['lowres'] = _read_param(params, 'lowres', 0)
+    opts['timeout'] = _read_param(params, 'timeout', None)
+    opts['hedge_offset'] = _read_param(params, 'hedge_offset', None)
+    # draft decoding only applies to JPEG frames that need scaling
+    opts['draft'] = (_read_param(params, 'draft', False) and
+                     opts['transport'] == 'image' and
+                     opts['codec'] == 'mjpeg' and
+                     opts['size'] is not None)
+
+    if opts['transport'] not in ('image', 'rawvideo'):
+        raise ValueError("unrecognized frame transport '%s'" %
+                         opts['transport'])
+    if opts['decode_profile'] not in ('default', 'turbo'):
+        raise ValueError("unrecognized decode profile '%s'" %
+                         opts['decode_profile'])
+    if opts['transport'] == 'rawvideo' and opts['size'] is None:
+        raise ValueError("frame size is required for rawvideo transport")
+    if opts['timeout'] is not None and opts['timeout'] <= 0:
+        raise ValueError("timeout should be positive, got %s" %
+                         opts['timeout'])
+    if opts['size'] is not None:
+        opts['size'] = tuple(int(length) for length in opts['size'])
+    return opts
+
+
+def _input_args(opts, timestamp=None):
+    """Return the FFmpeg options preceding an ``-i`` input.
+
+    `timestamp` is the point to input seek to, if any.
+
+    """
+
+    args = []
+    if opts['decode_profile'] == 'turbo':
+        # don't even demux the streams we don't need, and skip
+        # deblocking, which doesn't survive downscaling anyway
+        args += ['-an', '-sn', '-dn', '-skip_loop_filter', 'all']
+    if opts['lowres'] > 0:
+        args += ['-lowres', str(opts['lowres'])]
+    if timestamp is None:
+        return args
+    if opts['keyframes_only']:
+        # stop at the keyframe seeked to, and don't even decode the
+        # frames in between
+        args += ['-noaccurate_seek', '-skip_frame', 'nokey']
+    args += ['-ss', str(timestamp)]
+    return args
+
+
+def _scale_filter(size):
+    """Return the FFmpeg filter scaling frames to the given size."""
+    # Lanczos is also what create_thumbnail in storyboard.storyboard uses
+    return 'scale=%d:%d:flags=lanczos' % size
+
+
+def _output_args(opts, single=False):
+    """Return the FFmpeg output options (including the output file).
+
+    `single` indicates whether only one frame is written, in which case
+    the output doesn't need to be a splittable stream.
+
+    """
+
+    if opts['transport'] == 'rawvideo':
+        return ['-f', 'rawvideo', '-pix_fmt', 'rgb24', '-']
+    args = ['-f', 'image2' if single else 'image2pipe',
+            '-vcodec', opts['codec']]
+    if opts['codec'] == 'png':
+        # ffmpeg picks rgb48be for high bit depth sources, which doubles
+        # the size of the PNG for nothing
+        args += ['-pix_fmt', 'rgb24']
+    elif opts['codec'] == 'mjpeg':
+        # a fixed quantizer rather than the default bit rate control,
+        # under which the quality of a frame would depend on the frames
+        # encoded before it in the same process
+        args += ['-q:v', '2']
+    args.append('-')
+    return args
+
+
+def _iter_frames_sequential(batches, run_batch, advise=None):
+    """Extract frames from batches of timestamps one batch at a time.
+
+    `run_batch` is called with each batch, and returns an iterable of
+    frames (see `_iter_batch`). `advise`, if not ``None``, is called
+    with the index of each batch right before it is started.
+
+    """
+
+    for index, batch in enumerate(batches):
+        if advise is not None:
+            advise(index)
+        for frame in run_batch(batch):
+            yield frame
+
+
+def _iter_frames_parallel(batches, run_batch, jobs, advise=None):
+    """Extract frames from batches of timestamps concurrently.
+
+    Batches are handed out to at most `jobs` worker threads, each of
+    which drives one FFmpeg process at a time, by calling `run_batch`
+    with the batch and a keyword argument `register` (see
+    `_run_ffmpeg`). Frames are yielded batch by batch in the original
+    order.
+
+    Workers never run more than ``2 * jobs`` batches ahead of the
+    consumer, so that finished but not yet consumed frames don't pile up
+    in memory when the consumer is slower than FFmpeg.
+
+    If any batch fails, or the consumer stops iterating, no more batches
+    are started, and all running FFmpeg processes are killed before the
+    worker threads are joined. The first error (in batch order) is
+    reraised.
+
+    `advise`, if not ``None``, is called (from a worker thread) with the
+    index of each batch right before it is started.
+
+    """
+
+    condition = threading.Condition()
+    pending = list(range(len(batches)))
+    # each slot is eventually filled with a tuple (success, value),
+    # where value is either the list of frames or the exception raised
+    results = [None] * len(batches)
+    procs = []
+    # index of the batch being consumed
+    state = {'stopped': False, 'consumed': 0}
+    lookahead = 2 * jobs
+
+    def register(proc):
+        """Keep track of a newly spawned FFmpeg process."""
+        with condition:
+            procs.append(proc)
+            if state['stopped']:
+                _kill_quietly(proc)
+
+    def worker():
+        """Process pending batches until there's none left."""
+        while True:
+            with condition:
+                while (pending and not state['stopped'] and
+                       pending[0] >= state['consumed'] + lookahead):
+                    condition.wait()
+                if state['stopped'] or not pending:
+                    return
+                index = pending.pop(0)
+            if advise is not None:
+                advise(index)
+            try:
+                result = (True, list(run_batch(batches[index],
+                                               register=register)))
+            except Exception as err:  # pylint: disable=broad-except
+                result = (False, err)
+            with condition:
+                results[index] = result
+                condition.notify_all()
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(jobs, len(batches)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        for index in range(len(batches)):
+            with condition:
+                state['consumed'] = index
+                condition.notify_all()
+                while results[index] is None:
+                    condition.wait()
+                success, value = results[index]
+                # drop our reference to the frames once handed out
+                results[index] = (success, None)
+            if not success:
+                raise value
+            for frame in value:
+                yield frame
+    finally:
+        with condition:
+            state['stopped'] = True
+            condition.notify_all()
+            for proc in procs:
+                _kill_quietly(proc)
+        for thread in threads:
+            thread.join()
+
+
+def _advise_willneed(video_path, byte_ranges):
+    """Advise the kernel to read ahead regions of a file.
+
+    This is only a hint; errors are ignored, and so are platforms
+    without ``posix_fadvise``.
+
+    """
+
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(video_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        for offset, length in byte_ranges:
+            # a length of 0 means up to the end of the file
+            if length > 0:
+                os.posix_fadvise(fd, max(offset, 0), length,
+                                 os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _ExtractionTimeout(OSError):
+    """FFmpeg was killed for exceeding the extraction deadline."""
+    pass
+
+
+def _kill_quietly(proc):
+    """Kill a subprocess if it is still running."""
+    if proc.poll() is None:
+        try:
+            proc.kill()
+        except OSError:
+            # already exited
+            pass
+
+
+def _iter_batch(video_path, timestamps, opts, register=None):
+    """Extract frames from a batch of timestamps.
+
+    Dispatch to `_iter_frames_single_process`, or to
+    `_extract_frame_hedged` frame by frame if hybrid seeking is
+    requested, or, for the frames not extracted yet, if the batch fails
+    or times out and hedging is requested. Arguments are the same as
+    those of `_iter_frames_single_process`.
+
+    """
+
+    if isinstance(video_path, list):
+        video_paths = video_path
+    else:
+        video_paths = [video_path] * len(timestamps)
+
+    if opts['frame_by_frame'] and opts['seek_margin'] is not None:
+        for path, timestamp in zip(video_paths, timestamps):
+            yield _extract_frame_hedged(path, timestamp, opts,
+                                        register=register)
+        return
+
+    counter = 0
+    try:
+        for frame in _iter_frames_single_process(video_path, timestamps,
+                                                 opts, register=register):
+            counter += 1
+            yield frame
+    except OSError:
+        # _ExtractionTimeout included
+        if opts['timeout'] is None or opts['hedge_offset'] is None:
+            raise
+        # isolate the stalled or failed seek, so that it doesn't hold up
+        # or fail the rest of the batch
+        for path, timestamp in zip(video_paths[counter:],
+                                   timestamps[counter:]):
+            yield _extract_frame_hedged(path, timestamp, opts,
+                                        register=register)
+
+
+def _extract_frame_hybrid(video_path, timestamp, opts, register=None):
+    """Extract a video frame with hybrid seeking.
+
+    See the `seek_margin` parameter of `extract_frame` for the
+    strategy. `opts` is a dict returned by `_read_extraction_params`,
+    and `register` is passed on to `_run_ffmpeg`.
+
+    Returns
+    -------
+    frame : Frame
+
+    Raises
+    ------
+    OSError
+        If even plain frame by frame seeking fails.
+
+    """
+
+    coarse_timestamp = timestamp - opts['seek_margin']
+    fallback_opts = dict(opts, seek_margin=None)
+    if coarse_timestamp <= 0:
+        # nothing to skip
+        return list(_iter_frames_single_process(
+            video_path, [timestamp], fallback_opts, register=register))[0]
+
+    ffmpeg_args = [opts['ffmpeg_bin']]
+    ffmpeg_args += _input_args(opts)
+    ffmpeg_args += [
+        # land on the keyframe itself, so that we know where it is
+        '-noaccurate_seek',
+        '-ss', str(coarse_timestamp),
+        # keep timestamps relative to the start of the video, so that
+        # the output seek and the landing point are in the same terms
+        # as timestamp
+        '-copyts', '-start_at_zero',
+        '-i', video_path,
+    ]
+    if opts['decode_profile'] == 'turbo':
+        ffmpeg_args += ['-map', '0:v:0']
+    # showinfo sees every decoded frame, so the first one logged is the
+    # landing point; frame checksums are expensive and not needed (an
+    # FFmpeg too old for the checksum option fails, and we fall back to
+    # plain output seeking); the output seek is done with trim filters
+    # rather than -ss, which drops frames before the target without
+    # scaling them, and ends the filtergraph right after the target
+    filters = [
+        'showinfo=checksum=0',
+        'trim=start=%s' % timestamp,
+        'trim=end_frame=1',
+    ]
+    if opts['size'] is not None and not opts['draft']:
+        filters.append(_scale_filter(opts['size']))
     ffmpeg_args += [
-        '-f', 'image2',
-        '-vcodec', codec,
+        '-vf', ','.join(filters),
+        '-vsync', 'passthrough',
         '-vframes', '1',
         '-hide_banner',
-        '-',
     ]
-    proc = subprocess.Popen(ffmpeg_args,
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    frame_bytes, ffmpeg_err = proc.communicate()
-    if proc.returncode != 0:
-        msg = (("ffmpeg failed to extract frame at time %.2f\n"
-                "ffmpeg error message:\n%s") %
-               (timestamp, ffmpeg_err.strip().decode('utf-8')))
-        raise OSError(msg)
+    ffmpeg_args += _output_args(opts, single=True)
 
-    if not frame_bytes:
-        # empty output, no frame generated
-        msg = ("ffmpeg generated no output "
-               "(timestamp %.2f might be out of range)"
-               "ffmpeg error message:\n%s" %
-               (timestamp, ffmpeg_err.strip().decode('utf-8')))
-        raise OSError(msg)
+    log = []
+    try:
+        frame = list(_run_ffmpeg(ffmpeg_args, [timestamp], opts,
+                                 register=register, log=log))[0]
+    except OSError:
+        frame = None
+    else:
+        match = re.search(r'showinfo.*\bpts_time:\s*(\S+)', log[0])
+        try:
+            landing_timestamp = float(match.group(1))
+        except (AttributeError, ValueError):
+            landing_timestamp = None
+        if landing_timestamp is None or landing_timestamp > timestamp:
+            # overshot; the frame is not the one we want
+            frame = None
+    if frame is None:
+        frame = list(_iter_frames_single_process(
+            video_path, [timestamp], fallback_opts, register=register))[0]
+    return frame
+
+
+def _iter_frames_single_process(video_path, timestamps, opts, register=None,
+                                buffers=None):
+    """Extract frames from a batch of timestamps with one FFmpeg process.
+
+    See `iter_frames` for the strategy (and its limits: the process is
+    shared, but every timestamp is a separate input, which opens and
+    probes the file again). `video_path` is either the path to the
+    video file, or a list of paths, one for each timestamp, in which
+    case frames from different files can be combined in one FFmpeg
+    process (see `batch_extract_frames`). `opts` is a dict returned by
+    `_read_extraction_params`, and `register` and `buffers` are passed
+    on to `_run_ffmpeg`.
+
+    """
+
+    if isinstance(video_path, list):
+        video_paths = video_path
+    else:
+        video_paths = [video_path] * len(timestamps)
+    # frames of different videos need to be brought to the same size
+    # (and sample aspect ratio) before they can be concatenated
+    mixed = len(set(video_paths)) > 1
+    if mixed and opts['size'] is None:
+        raise ValueError("frame size is required to combine frames from "
+                         "different videos")
+    if mixed:
+        frame_chain = ',%s,setsar=1' % _scale_filter(opts['size'])
+    else:
+        frame_chain = ''
+
+    ffmpeg_args = [opts['ffmpeg_bin'], '-hide_banner']
+    filters = []
+    for index, (path, timestamp) in enumerate(zip(video_paths, timestamps)):
+        if opts['frame_by_frame']:
+            # output seeking, translated to a trim filter since -ss
+            # after -i would apply to the only output
+            ffmpeg_args += _input_args(opts)
+            ffmpeg_args += ['-i', path]
+            filters.append('[%d:v:0]trim=start=%s,trim=end_frame=1%s[v%d]' %
+                           (index, timestamp, frame_chain, index))
+        else:
+            # input seeking
+            ffmpeg_args += _input_args(opts, timestamp)
+            ffmpeg_args += ['-i', path]
+            filters.append('[%d:v:0]trim=end_frame=1%s[v%d]' %
+                           (index, frame_chain, index))
+    # concatenated frames are renumbered one second apart to keep
+    # timestamps strictly increasing in any time base, and passed
+    # through as is (no frame rate conversion)
+    output_chain = 'concat=n=%d:v=1:a=0,setpts=N/TB' % len(timestamps)
+    if opts['size'] is not None and not mixed and not opts['draft']:
+        output_chain += ',' + _scale_filter(opts['size'])
+    filters.append('%s%s[out]' % (
+        ''.join('[v%d]' % index for index in range(len(timestamps))),
+        output_chain))
+    ffmpeg_args += [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[out]',
+        '-vsync', 'passthrough',
+    ]
+    ffmpeg_args += _output_args(opts)
+
+    for frame in _run_ffmpeg(ffmpeg_args, timestamps, opts, register,
+                             buffers=buffers):
+        yield frame
+
+
+def _run_ffmpeg(ffmpeg_args, timestamps, opts, register=None, log=None,
+                buffers=None):
+    """Run FFmpeg and read the frames it generates from stdout.
+
+    Parameters
+    ----------
+    ffmpeg_args : list
+        Full FFmpeg command line, writing exactly one frame per
+        timestamp to stdout.
+    timestamps : list
+        Timestamps of the frames, in output order.
+    opts : dict
+        Options returned by `_read_extraction_params`, which determine
+        how the output is split into frames.
+    register : callable, optional
+        If not ``None``, called with the ``Popen`` object right after
+        the FFmpeg process is spawned.
+    log : list, optional
+        If not ``None``, FFmpeg's stderr output is appended to it (as a
+        str) once FFmpeg exits.
+    buffers : list, optional
+        If not ``None``, writable buffers, one per timestamp, that the
+        frames are read into (rawvideo transport only), e.g., slices of
+        a preallocated array; the images of the frames are views of the
+        buffers.
+
+    Yields
+    ------
+    frame : Frame
+
+    Raises
+    ------
+    OSError
+        If FFmpeg fails, or generates fewer frames than timestamps.
+    _ExtractionTimeout
+        If FFmpeg is killed for exceeding the deadline set by the
+        `timeout` option.
+
+    """
+
+    # stderr goes to a temporary file rather than a pipe, since we only
+    # read it after stdout is exhausted, and with many inputs ffmpeg may
+    # well fill up the pipe buffer before that
+    with tempfile.TemporaryFile() as errfile:
+        proc = subprocess.Popen(ffmpeg_args,
+                                stdout=subprocess.PIPE, stderr=errfile)
+        if register is not None:
+            register(proc)
+        # deadline timers kill ffmpeg, which makes the blocking reads
+        # below return
+        timers = []
+        timed_out = []
+
+        def expire():
+            """Kill FFmpeg for missing the deadline."""
+            if proc.poll() is None:
+                timed_out.append(True)
+                _kill_quietly(proc)
+
+        def set_deadline(seconds):
+            """Replace the current deadline, if any."""
+            if timers:
+                timers.pop().cancel()
+            if seconds is not None:
+                timer = threading.Timer(seconds, expire)
+                timer.daemon = True
+                timer.start()
+                timers.append(timer)
+
+        try:
+            counter = 0
+            if opts['timeout'] is not None:
+                # every input is seeked before the first frame comes out
+                set_deadline(opts['timeout'] * len(timestamps))
+            while True:
+                if counter == len(timestamps):
+                    # drain the output to make sure there is no surplus
+                    if proc.stdout.read(1):
+                        raise OSError("ffmpeg generated more frames than "
+                                      "requested")
+                    break
+                try:
+                    frame_image = _read_frame_image(
+                        proc.stdout, opts, single=len(timestamps) == 1,
+                        buf=(buffers[counter] if buffers is not None
+                             else None))
+                except OSError:
+                    if timed_out:
+                        # truncated output is the symptom, not the cause
+                        break
+                    raise
+                if frame_image is None:
+                    break
+                # the deadline doesn't run while the consumer holds us up
+                set_deadline(None)
+                yield Frame(timestamps[counter], frame_image)
+                counter += 1
+                if opts['timeout'] is not None:
+                    set_deadline(opts['timeout'])
+            proc.wait()
+        finally:
+            set_deadline(None)
+            if proc.returncode is None:
+                # early exit, either because of an error or because the
+                # consumer stopped iterating
+                _kill_quietly(proc)
+                proc.wait()
+            proc.stdout.close()
+
+        errfile.seek(0)
+        ffmpeg_err = errfile.read().strip().decode('utf-8', 'ignore')
+        if log is not None:
+            log.append(ffmpeg_err)
+        if timed_out:
+            raise _ExtractionTimeout(
+                "ffmpeg timed out after %s seconds extracting frame at %.2f"
+                % (opts['timeout'],
+                   timestamps[min(counter, len(timestamps) - 1)]))
+        if proc.returncode != 0:
+            msg = (("ffmpeg failed to extract frame at time %s\n"
+                    "ffmpeg error message:\n%s") %
+                   (', '.join('%.2f' % t for t in timestamps), ffmpeg_err))
+            raise OSError(msg)
+        if counter < len(timestamps):
+            if len(timestamps) == 1:
+                msg = ("ffmpeg generated no output "
+                       "(timestamp %.2f might be out of range)\n"
+                       "ffmpeg error message:\n%s" %
+                       (timestamps[0], ffmpeg_err))
+            else:
+                msg = ("ffmpeg generated only %d of %d frames "
+                       "(timestamp %.2f or later might be out of range)\n"
+                       "ffmpeg error message:\n%s" %
+                       (counter, len(timestamps), timestamps[counter],
+                        ffmpeg_err))
+            raise OSError(msg)
+
+
+def _read_frame_image(stream, opts, single=False, buf=None):
+    """Read the next frame generated by FFmpeg from its stdout.
+
+    Parameters
+    ----------
+    stream : file
+        The stdout of FFmpeg.
+    opts : dict
+        Options returned by `_read_extraction_params`.
+    single : bool
+        Whether FFmpeg is expected to output a single frame. In that
+        case, images of any codec can be read.
+    buf : writable buffer, optional
+        See `_read_rawvideo`. Ignored for other transports.
+
+    Returns
+    -------
+    image : PIL.Image.Image
+        ``None`` if the stream is exhausted.
+
+    Raises
+    ------
+    OSError
+        If the output is malformed.
+
+    """
+
+    if opts['transport'] == 'rawvideo':
+        return _read_rawvideo(stream, opts['size'], buf=buf)
 
+    if opts['codec'] == 'png':
+        frame_bytes = _read_png(stream)
+    elif opts['codec'] == 'mjpeg':
+        frame_bytes = _read_jpeg(stream)
+    elif single:
+        frame_bytes = stream.read()
+    else:
+        raise ValueError("cannot split a stream of %s images" %
+                         opts['codec'])
+    if not frame_bytes:
+        return None
     try:
-        frame_image = Image.open(io.BytesIO(frame_bytes))
+        image = Image.open(io.BytesIO(frame_bytes))
     except IOError:
         raise OSError("failed to open frame with PIL.Image.open")
+    if opts['draft']:
+        # DCT-domain downscaling by the JPEG decoder, to the smallest
+        # scale no smaller than the target size; the rest of the way is
+        # done with a regular resize
+        image.draft('RGB', opts['size'])
+        if image.size != opts['size']:
+            image = image.resize(opts['size'], Image.LANCZOS)
+    return image
+
+
+def _read_rawvideo(stream, size, buf=None):
+    """Read a single raw RGB24 frame of the given size from a stream.
+
+    The pixels are read directly into a preallocated buffer (`buf`, a
+    writable buffer of exactly the size of the frame, if given), which
+    is then handed to ``PIL.Image.frombuffer`` without intermediate
+    copies.
+
+    Returns
+    -------
+    image : PIL.Image.Image
+        ``None`` if the stream is exhausted.
+
+    Raises
+    ------
+    OSError
+        If the stream ends in the middle of the frame.
+
+    """
+
+    width, height = size
+    if buf is None:
+        buf = bytearray(width * height * 3)
+    view = memoryview(buf)
+    filled = 0
+    while filled < len(buf):
+        nbytes = stream.readinto(view[filled:])
+        if not nbytes:
+            break
+        filled += nbytes
+    if filled == 0:
+        return None
+    if filled < len(buf):
+        raise OSError("truncated raw video frame from ffmpeg")
+    return Image.frombuffer('RGB', size, buf, 'raw', 'RGB', 0, 1)
+
+
+def _read_exactly(stream, size):
+    """Read exactly `size` bytes from a stream.
+
+    Returns
+    -------
+    data : bytes
+        Might be shorter than `size` only if EOF is reached.
+
+    """
+
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def _read_png(stream):
+    """Read a single PNG image from a stream of concatenated PNGs.
+
+    Returns
+    -------
+    png_bytes : bytes
+        The complete PNG file, or ``None`` if the stream is exhausted.
+
+    Raises
+    ------
+    OSError
+        If the stream does not contain a well-formed PNG.
+
+    """
+
+    signature = _read_exactly(stream, 8)
+    if not signature:
+        return None
+    if signature != _PNG_SIGNATURE:
+        raise OSError("malformed PNG stream from ffmpeg")
+    chunks = [signature]
+    while True:
+        chunk_header = _read_exactly(stream, 8)
+        if len(chunk_header) != 8:
+            raise OSError("truncated PNG stream from ffmpeg")
+        length, chunk_type = struct.unpack('>I4s', chunk_header)
+        # chunk data followed by 4-byte CRC
+        chunk_body = _read_exactly(stream, length + 4)
+        if len(chunk_body) != length + 4:
+            raise OSError("truncated PNG stream from ffmpeg")
+        chunks.append(chunk_header)
+        chunks.append(chunk_body)
+        if chunk_type == b'IEND':
+            return b''.join(chunks)
+
+
+def _read_jpeg(stream):
+    """Read a single JPEG image from a stream of concatenated JPEGs.
+
+    Marker segments are skipped according to their lengths, and
+    entropy-coded data, where 0xFF bytes are always followed by a zero
+    stuffing byte or a restart marker, is scanned for the next marker,
+    up to the end of image marker. Nothing is decoded. `stream` should
+    support ``peek``, as the (buffered) stdout of a subprocess does.
+
+    Returns
+    -------
+    jpeg_bytes : bytes
+        The complete JPEG file, or ``None`` if the stream is exhausted.
+
+    Raises
+    ------
+    OSError
+        If the stream does not contain a well-formed JPEG.
+
+    """
+
+    soi = _read_exactly(stream, 2)
+    if not soi:
+        return None
+    if soi != _JPEG_SOI:
+        raise OSError("malformed JPEG stream from ffmpeg")
+    chunks = [soi]
+    marker = _read_exactly(stream, 2)
+    while True:
+        if len(marker) != 2 or marker[:1] != b'\xff':
+            raise OSError("malformed JPEG stream from ffmpeg")
+        if marker[1:] == b'\xff':
+            # fill byte
+            chunks.append(marker[:1])
+            marker = marker[1:] + _read_exactly(stream, 1)
+            continue
+        chunks.append(marker)
+        if marker[1:] == b'\xd9':
+            # end of image
+            return b''.join(chunks)
+        if b'\xd0' <= marker[1:] <= b'\xd7' or marker[1:] == b'\x01':
+            # standalone markers
+            marker = _read_exactly(stream, 2)
+            continue
+        length_bytes = _read_exactly(stream, 2)
+        if len(length_bytes) != 2:
+            raise OSError("truncated JPEG stream from ffmpeg")
+        length, = struct.unpack('>H', length_bytes)
+        segment = _read_exactly(stream, length - 2)
+        if len(segment) != length - 2:
+            raise OSError("truncated JPEG stream from ffmpeg")
+        chunks.append(length_bytes)
+        chunks.append(segment)
+        if marker[1:] == b'\xda':
+            # start of scan, followed by entropy-coded data
+            marker = _read_entropy_coded_data(stream, chunks)
+        else:
+            marker = _read_exactly(stream, 2)
+
+
+def _read_entropy_coded_data(stream, chunks):
+    """Read the entropy-coded data of a JPEG scan into `chunks`.
+
+    Returns
+    -------
+    marker : bytes
+        The marker ending the data, which is consumed but not appended
+        to `chunks`.
+
+    Raises
+    ------
+    OSError
+        If the stream ends first.
+
+    """
 
-    return Frame(timestamp, frame_image)
+    while True:
+        data = stream.peek(1)
+        if not data:
+            raise OSError("truncated JPEG stream from ffmpeg")
+        index = data.find(b'\xff')
+        if index < 0:
+            chunks.append(stream.read(len(data)))
+            continue
+        chunks.append(stream.read(index))
+        marker = _read_exactly(stream, 2)
+        if len(marker) != 2:
+            raise OSError("truncated JPEG stream from ffmpeg")
+        if marker[1:] == b'\x00' or b'\xd0' <= marker[1:] <= b'\xd7':
+            # stuffed 0xFF byte, or restart marker
+            chunks.append(marker)
+            continue
+        return marker
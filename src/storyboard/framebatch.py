@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+"""Hold batches of same-size frames in a NumPy array.
+
+This module requires NumPy, which is an optional dependency of this
+package (install it with ``pip install storyboard[numpy]``).
+``storyboard.frame.screen_frames`` uses it when NumPy is installed, and
+falls back to Pillow otherwise.
+
+Classes
+-------
+.. autosummary::
+    FrameBatch
+
+----
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy
+from PIL import Image
+
+from storyboard.frame import Frame
+from storyboard.frame import _MAX_FRAMES_PER_PROCESS
+from storyboard.frame import _iter_frames_single_process
+from storyboard.frame import _read_extraction_params
+from storyboard.util import read_param as _read_param
+
+
+# ITU-R 601-2 luma weights, as in PIL.Image.Image.convert('L')
+_LUMA_WEIGHTS = numpy.array([0.299, 0.587, 0.114], dtype=numpy.float32)
+
+
+class FrameBatch(object):
+    """Same-size video frames held in one contiguous NumPy array.
+
+    Unlike a list of ``storyboard.frame.Frame`` objects, each wrapping
+    its own image, a batch keeps the pixels of all its frames in a
+    single ``(N, H, W, 3)`` array of ``uint8`` (RGB), so that
+    statistics can be computed for the whole batch at once, with NumPy
+    rather than per-frame Python. Frames are turned into PIL images
+    without copying (see `image`), e.g., to pass them on to
+    ``storyboard.storyboard.create_thumbnail`` or
+    ``storyboard.storyboard.tile_images``.
+
+    Parameters
+    ----------
+    timestamps : list
+        Timestamps of the frames, in seconds.
+    array : numpy.ndarray
+        A C-contiguous array of shape ``(N, H, W, 3)`` and type
+        ``uint8``, where N is the number of timestamps. It is used as
+        is, not copied.
+
+    Raises
+    ------
+    ValueError
+        If `array` is not of the expected shape, type or layout.
+
+    Attributes
+    ----------
+    timestamps : list
+    array : numpy.ndarray
+    size : tuple
+        A tuple ``(width, height)``, the size of the frames.
+
+    """
+
+    def __init__(self, timestamps, array):
+        if ((array.ndim != 4 or array.shape[0] != len(timestamps) or
+             array.shape[3] != 3)):
+            raise ValueError("expected an array of shape (%d, H, W, 3), "
+                             "got %s" % (len(timestamps), array.shape))
+        if array.dtype != numpy.uint8:
+            raise ValueError("expected an array of uint8, got %s" %
+                             array.dtype)
+        if not array.flags['C_CONTIGUOUS']:
+            raise ValueError("expected a C-contiguous array")
+        self.timestamps = list(timestamps)
+        self.array = array
+        self.size = (array.shape[2], array.shape[1])
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Copy a list of frames into a batch.
+
+        Parameters
+        ----------
+        frames : list
+            Nonempty list of ``storyboard.frame.Frame`` objects, whose
+            images all have the same size.
+
+        Returns
+        -------
+        batch : FrameBatch
+
+        Raises
+        ------
+        ValueError
+            If `frames` is empty, or the images differ in size.
+
+        """
+
+        if not frames:
+            raise ValueError("cannot make a batch of no frames")
+        size = frames[0].image.size
+        if any(frame.image.size != size for frame in frames):
+            raise ValueError("frames differ in size")
+        width, height = size
+        array = numpy.empty((len(frames), height, width, 3), numpy.uint8)
+        for index, frame in enumerate(frames):
+            array[index] = numpy.asarray(frame.image.convert('RGB'))
+        return cls([frame.timestamp for frame in frames], array)
+
+    @classmethod
+    def extract(cls, video_path, timestamps, params=None):
+        """Extract frames from a video directly into a batch.
+
+        Frames are extracted as with ``storyboard.frame.iter_frames``
+        (by a single FFmpeg process, or a few in turn for large
+        batches), in raw video, and read from FFmpeg's stdout straight
+        into their slots of the array, without any intermediate copy.
+
+        Parameters
+        ----------
+        video_path : str
+            Path to the video file.
+        timestamps : list
+            Timestamps of the frames, in seconds.
+        params : dict, optional
+            Optional parameters enclosed in a dict. Default is
+            ``None``. See the "Other Parameters" section for understood
+            key/value pairs.
+
+        Returns
+        -------
+        batch : FrameBatch
+
+        Raises
+        ------
+        OSError
+            If frame extraction with FFmpeg fails.
+
+        Other Parameters
+        ----------------
+        size : tuple
+            Size of the frames. Required.
+        ffmpeg_bin, keyframes_only, decode_profile, lowres, timeout
+            Optional. See the parameters of the same names of
+            ``storyboard.frame.extract_frame``.
+
+        """
+
+        if params is None:
+            params = {}
+        opts = _read_extraction_params(dict(params, transport='rawvideo'))
+        width, height = opts['size']
+        array = numpy.empty((len(timestamps), height, width, 3),
+                            numpy.uint8)
+        # one flat, writable view per frame
+        buffers = [memoryview(array[index].reshape(-1))
+                   for index in range(len(timestamps))]
+        for start in range(0, len(timestamps), _MAX_FRAMES_PER_PROCESS):
+            stop = start + _MAX_FRAMES_PER_PROCESS
+            # the frames themselves are views of the buffers
+            for _ in _iter_frames_single_process(
+                    video_path, timestamps[start:stop], opts,
+                    buffers=buffers[start:stop]):
+                pass
+        return cls(timestamps, array)
+
+    def image(self, index):
+        """Return a frame as a PIL image sharing the memory of the batch.
+
+        The image is read-only, and reflects later changes to `array`.
+        Operations that make new images, such as resizing, cropping or
+        pasting into another image, work as usual.
+
+        Parameters
+        ----------
+        index : int
+
+        Returns
+        -------
+        image : PIL.Image.Image
+            An RGB image.
+
+        """
+
+        return Image.frombuffer('RGB', self.size, self.array[index],
+                                'raw', 'RGB', 0, 1)
+
+    def frames(self):
+        """Return the frames as ``storyboard.frame.Frame`` objects.
+
+        The images are views of the batch (see `image`).
+
+        """
+
+        return [Frame(timestamp, self.image(index))
+                for index, timestamp in enumerate(self.timestamps)]
+
+    def luma(self):
+        """Return the luma of all frames, as an (N, H, W) float array."""
+        return numpy.dot(self.array, _LUMA_WEIGHTS)
+
+    def mean_luma(self):
+        """Return the mean luma (from 0 to 255) of each frame."""
+        return self.array.mean(axis=(1, 2)).dot(_LUMA_WEIGHTS)
+
+    def luma_std(self):
+        """Return the standard deviation of the luma of each frame."""
+        return self.luma().std(axis=(1, 2))
+
+    def mean_abs_diff(self, params=None):
+        """Return the mean absolute luma difference of consecutive frames.
+
+        Parameters
+        ----------
+        params : dict, optional
+            Optional parameters enclosed in a dict. Default is
+            ``None``. See the "Other Parameters" section for understood
+            key/value pairs.
+
+        Returns
+        -------
+        diffs : numpy.ndarray
+            N-1 differences, the i-th between frames i and i+1.
+
+        Other Parameters
+        ----------------
+        stride : int, optional
+            Only compare every `stride`-th pixel in each direction,
+            which is nearly as good for telling frames apart, at a
+            fraction of the cost. Default is 4.
+
+        """
+
+        if params is None:
+            params = {}
+        stride = _read_param(params, 'stride', 4)
+        luma = numpy.dot(self.array[:, ::stride, ::stride], _LUMA_WEIGHTS)
+        return numpy.abs(numpy.diff(luma, axis=0)).mean(axis=(1, 2))
+
+    def laplacian_variance(self):
+        """Return the variance of the Laplacian of the luma of each frame.
+
+        This is a measure of sharpness (see
+        ``storyboard.frame.find_sharpest_frames``), here computed for
+        all frames at once, and without clipping.
+
+        """
+
+        luma = self.luma()
+        laplacian = (luma[:, :-2, 1:-1] + luma[:, 2:, 1:-1] +
+                     luma[:, 1:-1, :-2] + luma[:, 1:-1, 2:] -
+                     4 * luma[:, 1:-1, 1:-1])
+        return laplacian.var(axis=(1, 2))
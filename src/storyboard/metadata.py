@@ -30,8 +30,10 @@ import json
 import os
 import subprocess
 import sys
+import threading
 
 from storyboard import fflocate
+from storyboard import playlist as _playlist
 from storyboard import util
 from storyboard.util import read_param as _read_param
 from storyboard import version
@@ -45,6 +47,7 @@ _FORMAT_MAP = {
     'avi': 'Audio Video Interleaved',
     'flac': 'Native FLAC',
     'flv': 'Flash video',
+    'hls': 'HTTP Live Streaming playlist',
     'jpeg_pipe': 'JPEG',
     'matroska,webm': 'Matroska',
     'mp3': 'MP3',
@@ -57,6 +60,9 @@ _FORMAT_MAP = {
     'png_pipe': 'PNG',
 }
 
+# number of bytes read off the head of a video stream for ffprobe
+_STREAM_PROBE_SIZE = 8 * 1024 * 1024
+
 _VCODEC_MAP = {
     'h264': 'H.264',
     'hevc': 'HEVC',
@@ -115,6 +121,9 @@ class Stream(object):
     codec : str
         (Long) name of codec.
 
+    codec_name : str
+        Short name of codec as known to FFmpeg, e.g., ``'h264'``.
+
     bit_rate : float
         Bit rate of stream, in bit per second.
 
@@ -158,6 +167,10 @@ class Stream(object):
     info_string : str
         Assembled string of stream metadata, intended for printing.
 
+    attached_pic : bool
+        Whether the stream is a picture attached to the file (e.g., the
+        cover art of an MP3 file) rather than an actual video stream.
+
     """
 
     # pylint: disable=too-many-instance-attributes,too-few-public-methods
@@ -169,6 +182,7 @@ class Stream(object):
         self.index = None
         self.type = None
         self.codec = None
+        self.codec_name = None
         self.bit_rate = None
         self.bit_rate_text = None
         self.language_code = None
@@ -187,6 +201,7 @@ class Stream(object):
         self.channel_layout = None
         # assembled
         self.info_string = None
+        self.attached_pic = False
 
 
 class Video(object):
@@ -202,8 +217,10 @@ class Video(object):
 
     Parameters
     ----------
-    video : str
-        Path to the video file.
+    video : str or file-like object
+        Path to the video file, or a readable binary stream of the
+        video (e.g., ``sys.stdin.buffer``), which is never seeked. See
+        the "Notes" section for the caveats of streams.
     params : dict, optional
         Optional parameters enclosed in a dict. Default is ``None``. See
         the "Other Parameters" section for understood key/value pairs.
@@ -242,7 +259,8 @@ class Video(object):
     title : str
 
     size : int
-        Size of video file in bytes.
+        Size of video file in bytes (for a local HLS playlist, the
+        total size of its segment files).
 
     size_text : str
         Size as a human readable string, e.g., ``'128MiB'``.
@@ -270,6 +288,13 @@ class Video(object):
         through `compute_sha1sum` or `format_metadata` with the
         ``include_sha1sum`` optional parameter set to ``True``.
 
+    keyframes : list
+        Sorted timestamps (in seconds, relative to the start of the
+        video) of the keyframes in the first video stream. Since
+        building the keyframe index requires a scan over all packets of
+        the file, this attribute is only calculated and set upon
+        request, through `compute_keyframes`.
+
     frame_rate : float
         Frame rate of video stream, in frames per second (fps).
 
@@ -292,10 +317,35 @@ class Video(object):
     streams : list
         A list of Stream objects, containing per-stream metadata.
 
+    playlist : storyboard.playlist.Playlist
+        The parsed playlist if the video is a local HLS media playlist
+        (``.m3u8``), ``None`` otherwise. Stream metadata of a playlist
+        is taken from its first segment.
+
+    still_image : bool
+        Whether the file is a still image (e.g., JPEG or PNG), which
+        ffprobe reports as a video of a single frame. The scan type of
+        a still image is not probed.
+
     Notes
     -----
     The unmodified JSON output of ``ffprobe -show_format -show_streams``
-    on the video is saved in a private instance attribute `_ffprobe`.
+    on the video is saved in a private instance attribute `_ffprobe`
+    (for a playlist, format metadata is assembled from the playlist
+    instead).
+
+    Metadata of a stream is extracted from its first few megabytes,
+    which are held in memory until the stream is read through (with
+    `iter_stream`), so containers with their index at the end (e.g., MP4
+    files not optimized for streaming) are not supported. Since the
+    stream can only be read once, the size and the SHA-1 digest of a
+    stream are only known after `iter_stream` (which computes the
+    digest on the fly), or after `compute_sha1sum` (which reads the
+    stream through for nothing else), and the keyframe index of a
+    stream is always empty. The `path` attribute of a stream is
+    ``None``, its `stream` attribute is the stream itself (``None``
+    for files), and its `stream_consumed` attribute tells whether it
+    has been read through.
 
     """
 
@@ -321,10 +371,23 @@ class Video(object):
         video_duration = _read_param(params, 'video_duration', None)
         print_progress = _read_param(params, 'print_progress', False)
 
-        self.path = os.path.abspath(video)
-        if not os.path.exists(self.path):
-            raise OSError("'" + video + "' does not exist")
-        self.filename = os.path.basename(self.path)
+        if hasattr(video, 'read'):
+            self.stream = video
+            self.path = None
+            name = getattr(video, 'name', None)
+            self.filename = (os.path.basename(name)
+                             if isinstance(name, str) else '<stream>')
+            # the head of the stream, which is probed, and read again
+            # by iter_stream
+            self._stream_head = _read_head(video, _STREAM_PROBE_SIZE)
+            self.stream_consumed = False
+        else:
+            self.stream = None
+            self.stream_consumed = False
+            self.path = os.path.abspath(video)
+            if not os.path.exists(self.path):
+                raise OSError("'" + video + "' does not exist")
+            self.filename = os.path.basename(self.path)
         if hasattr(self.filename, 'decode'):
             # python2 str, need to be decoded to unicode for proper
             # printing
@@ -334,11 +397,21 @@ class Video(object):
             sys.stderr.write("Processing %s\n" % self.filename)
             sys.stderr.write("Crunching metadata...\n")
 
+        # segments of a local HLS playlist are probed individually
+        # rather than demuxing the whole playlist
+        if self.path is not None and _playlist.is_playlist(self.path):
+            self.playlist = _playlist.Playlist(self.path)
+        else:
+            self.playlist = None
+
+        # kept around for metadata computed upon request
+        self._ffprobe_bin = ffprobe_bin
         self._call_ffprobe(ffprobe_bin)
 
         self.title = self._get_title()
         self.format = self._get_format()
         self.size, self.size_text = self._get_size()
+        self._video_duration = video_duration
         if video_duration is None:
             self.duration, self.duration_text = self._get_duration()
         else:
@@ -346,6 +419,12 @@ class Video(object):
             self.duration_text = util.humantime(video_duration)
         self.bit_rate, self.bit_rate_text = self._get_bit_rate()
         self.sha1sum = None  # SHA-1 digest is generated upon request
+        # running SHA-1 digest and the number of bytes it has consumed,
+        # so that the digest of a growing file can be brought up to date
+        self._sha1 = None
+        self._sha1_offset = 0
+        self.keyframes = None  # keyframe index is built upon request
+        self._keyframe_positions = None
 
         # the remaining attributes will be dynamically set when parsing
         # streams
@@ -357,9 +436,15 @@ class Video(object):
         self.dar_text = None
 
         self._process_streams()
+        self.still_image = self._is_still_image()
 
         # detect if the file contains any video streams at all and try
-        # to extract scan type only if it does
+        # to extract scan type only if it does (a still image has
+        # nothing to scan)
+        if self.still_image:
+            self.scan_type = None
+            self.__dp("left StoryBoard.__init__")
+            return
         for stream in self.streams:
             if stream.type == 'video':
                 break
@@ -444,8 +529,11 @@ class Video(object):
         # filename
         lines.append("Filename:               %s" % self.filename)
         # size
-        lines.append("File size:              %d (%s)" %
-                     (self.size, self.size_text))
+        if self.size is not None:
+            lines.append("File size:              %d (%s)" %
+                         (self.size, self.size_text))
+        else:
+            lines.append("File size:              Not available")
         # sha1sum
         if include_sha1sum:
             self._get_sha1sum(print_progress)
@@ -519,6 +607,193 @@ class Video(object):
         self.__dp("left StoryBoard.compute_sha1sum")
         return self._get_sha1sum(print_progress=print_progress)
 
+    def compute_keyframes(self, params=None):
+        """Build the keyframe index of the first video stream.
+
+        Parameters
+        ----------
+        params : dict, optional
+            Optional parameters enclosed in a dict. Default is ``None``.
+            See the "Other Parameters" section for understood key/value
+            pairs.
+
+        Returns
+        -------
+        keyframes : list
+            Sorted keyframe timestamps in seconds, relative to the start
+            of the video. Empty if the file has no video stream, or if
+            the container doesn't flag keyframes.
+
+        Other Parameters
+        ----------------
+        print_progress : bool, optional
+            Whether to print progress information (to stderr). Default
+            is False.
+
+        Notes
+        -----
+        The index is built from a packet scan of the first video stream
+        with ffprobe (demuxing only, no decoding), which reads through
+        the entire file. The index is therefore only built upon request,
+        and further requests load the cached index rather than repeat
+        the scan.
+
+        """
+
+        self.__dp("entered StoryBoard.compute_keyframes")
+        if params is None:
+            params = {}
+        print_progress = _read_param(params, 'print_progress', False)
+
+        self.__dp("left StoryBoard.compute_keyframes")
+        return self._get_keyframes(print_progress=print_progress)
+
+    def iter_stream(self):
+        """Read the video stream through, once.
+
+        The SHA-1 digest is computed on the fly, and the `sha1sum`,
+        `size` and `size_text` attributes (and `bit_rate` and
+        `bit_rate_text`, if they weren't available) are set once the
+        stream is exhausted.
+
+        Yields
+        ------
+        chunk : bytes
+            The content of the stream, including the head read by the
+            constructor for metadata extraction.
+
+        Raises
+        ------
+        OSError
+            If the video is not a stream, or if the stream has already
+            been read through.
+
+        """
+
+        if self.stream is None:
+            raise OSError("'%s' is not a stream" % self.path)
+        if self.stream_consumed:
+            raise OSError("stream '%s' has already been read through" %
+                          self.filename)
+        self.stream_consumed = True
+        sha1 = hashlib.sha1()
+        size = 0
+        chunk = self._stream_head
+        self._stream_head = None
+        while chunk:
+            sha1.update(chunk)
+            size += len(chunk)
+            yield chunk
+            chunk = self.stream.read(self._SHA_CHUNK_SIZE)
+        self.sha1sum = sha1.hexdigest().upper()
+        self.size = size
+        self.size_text = util.humansize(size)
+        if self.bit_rate is None:
+            self.bit_rate, self.bit_rate_text = self._get_bit_rate()
+
+    def refresh(self, params=None):
+        """Update metadata after the video file has grown.
+
+        This is meant for recordings that are still being written:
+        if the file has grown since the metadata was extracted, ffprobe
+        is called again for the container and stream metadata, while
+        the costly metadata computed upon request is brought up to
+        date from where it left off rather than from scratch, i.e., the
+        SHA-1 digest only consumes the new bytes (upon the next
+        request), and the keyframe index is only extended with a scan
+        from its last keyframe. The scan type is kept as is.
+
+        Parameters
+        ----------
+        params : dict, optional
+            Optional parameters enclosed in a dict. Default is ``None``.
+            See the "Other Parameters" section for understood key/value
+            pairs.
+
+        Returns
+        -------
+        grown : bool
+            Whether the file has grown (in which case metadata has been
+            updated).
+
+        Raises
+        ------
+        OSError
+            If the file has disappeared, or if ffprobe fails.
+
+        Other Parameters
+        ----------------
+        print_progress : bool, optional
+            Whether to print progress information (to stderr). Default
+            is False.
+
+        Notes
+        -----
+        The file is assumed to be only ever appended to. If it has
+        shrunk instead, it is assumed to have been replaced, and
+        metadata computed upon request is discarded, to be computed
+        again from scratch upon the next request. A duration given
+        through the `video_duration` parameter of the constructor is
+        kept as is.
+
+        """
+
+        self.__dp("entered StoryBoard.refresh")
+        if params is None:
+            params = {}
+        print_progress = _read_param(params, 'print_progress', False)
+
+        if self.stream is not None:
+            # nothing to catch up with
+            self.__dp("left StoryBoard.refresh")
+            return False
+
+        if self.playlist is not None:
+            self.playlist = _playlist.Playlist(self.path)
+            size = self.playlist.size()
+        else:
+            size = os.path.getsize(self.path)
+        if size == self.size:
+            self.__dp("left StoryBoard.refresh")
+            return False
+        if print_progress:
+            sys.stderr.write("Refreshing metadata of %s...\n" % self.filename)
+
+        self._call_ffprobe(self._ffprobe_bin)
+        self.title = self._get_title()
+        old_size = self.size
+        self.size, self.size_text = self._get_size()
+        if self._video_duration is None:
+            self.duration, self.duration_text = self._get_duration()
+        self.bit_rate, self.bit_rate_text = self._get_bit_rate()
+        self._process_streams()
+
+        self.sha1sum = None
+        if self.size < old_size:
+            # replaced rather than appended to
+            self._sha1 = None
+            self._sha1_offset = 0
+            self.keyframes = None
+            self._keyframe_positions = None
+        elif self.keyframes:
+            # the last GOP may have been incomplete, so it is scanned
+            # again
+            last_keyframe = self.keyframes[-1]
+            index = [(timestamp, position) for timestamp, position
+                     in zip(self.keyframes, self._keyframe_positions)
+                     if timestamp < last_keyframe]
+            index += [item for item in self._scan_keyframes(last_keyframe)
+                      if item[0] >= last_keyframe]
+            index.sort()
+            self.keyframes = [timestamp for timestamp, _ in index]
+            self._keyframe_positions = [position for _, position in index]
+        elif self.keyframes is not None:
+            # nothing to resume from
+            self.keyframes = None
+            self._keyframe_positions = None
+        self.__dp("left StoryBoard.refresh")
+        return True
+
     def _call_ffprobe(self, ffprobe_bin):
         """Call ffprobe to extract video metadata.
 
@@ -526,6 +801,12 @@ class Video(object):
         options, and its JSON output is parsed and stored in the
         `_ffprobe` attribute.
 
+        For a local HLS playlist, only the first segment is probed
+        (through the probe cache of ``storyboard.playlist``), and the
+        format metadata is assembled from the playlist: the duration is
+        the sum of the segment durations, and the size is the total
+        size of the segment files.
+
         Parameters
         ----------
         ffprobe_bin : str
@@ -539,16 +820,36 @@ class Video(object):
         """
 
         self.__dp("entered StoryBoard._call_ffprobe")
+        if self.playlist is not None:
+            first_segment = self.playlist.segments[0]
+            probe = _playlist.Playlist.probe_segment(first_segment,
+                                                     ffprobe_bin)
+            size = self.playlist.size()
+            duration = self.playlist.duration
+            fmt = {
+                'filename': self.path,
+                'format_name': 'hls',
+                'size': str(size),
+                'duration': str(duration),
+            }
+            if duration > 0:
+                fmt['bit_rate'] = str(int(size * 8 / duration))
+            if 'tags' in probe['format']:
+                fmt['tags'] = probe['format']['tags']
+            self._ffprobe = {'format': fmt, 'streams': probe['streams']}
+            self.__dp("left StoryBoard._call_ffprobe")
+            return
         ffprobe_args = [
             ffprobe_bin,
             '-print_format', 'json',
             '-show_format', '-show_streams',
             '-hide_banner',
-            self.path
+            self.path if self.stream is None else 'pipe:0',
         ]
-        proc = subprocess.Popen(ffprobe_args,
+        proc = subprocess.Popen(ffprobe_args, stdin=subprocess.PIPE,
                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        ffprobe_out, ffprobe_err = proc.communicate()
+        ffprobe_out, ffprobe_err = proc.communicate(
+            self._stream_head if self.stream is not None else None)
         ffprobe_out = ffprobe_out.decode('utf-8', 'ignore')
         ffprobe_err = ffprobe_err.decode('utf-8', 'ignore')
 
@@ -558,7 +859,7 @@ class Video(object):
         self.__dp(ffprobe_err)
         if proc.returncode != 0:
             msg = ("ffprobe failed on '%s'\nffprobe error message:\n%s"
-                   % (self.path, ffprobe_err.strip()))
+                   % (self.path or self.filename, ffprobe_err.strip()))
             raise OSError(msg)
         self._ffprobe = json.loads(ffprobe_out)
         self.__dp("left StoryBoard._call_ffprobe")
@@ -612,7 +913,7 @@ class Video(object):
         self.__dp("entered StoryBoard._get_format")
         format_name = self._ffprobe['format']['format_name']
         # lowercase extension without period
-        extension = os.path.splitext(self.path)[1].lower()[1:]
+        extension = os.path.splitext(self.filename)[1].lower()[1:]
 
         if format_name in _FORMAT_MAP:
             fmt = _FORMAT_MAP[format_name]
@@ -648,19 +949,43 @@ class Video(object):
         self.__dp("left StoryBoard._get_format")
         return fmt
 
+    def _is_still_image(self):
+        """Tell whether the file is a still image.
+
+        Image formats are demuxed by FFmpeg's image2 family of demuxers
+        (``image2`` for files recognized by extension, ``*_pipe`` for
+        files recognized by content), which report a single video
+        stream.
+
+        Returns
+        -------
+        bool
+
+        """
+
+        format_name = self._ffprobe['format']['format_name']
+        if format_name != 'image2' and not format_name.endswith('_pipe'):
+            return False
+        return len(self.streams) == 1 and self.streams[0].type == 'video'
+
     def _get_size(self):
         """Get size of the video file.
 
         Returns
         -------
         size : int
-            Size in bytes.
+            Size in bytes. ``None`` if not available (for a stream that
+            hasn't been read through yet).
         size_text: str
             Size as a human readable string, e.g., ``'128MiB'``.
+            ``None`` if not available.
 
         """
 
         self.__dp("entered StoryBoard._get_size")
+        if 'size' not in self._ffprobe['format']:
+            self.__dp("left StoryBoard._get_size")
+            return (None, None)
         size = int(self._ffprobe['format']['size'])
         size_text = util.humansize(size)
         self.__dp("left StoryBoard._get_size")
@@ -744,15 +1069,28 @@ class Video(object):
 
         if print_progress:
             sys.stderr.write("Computing SHA-1 digest...\n")
+        if self.stream is not None:
+            # the digest is computed as the stream is read through
+            for _ in self.iter_stream():
+                pass
+            self.__dp("left StoryBoard._get_sha1sum")
+            return self.sha1sum
         with open(self.path, 'rb') as video:
-            sha1 = hashlib.sha1()
-            totalsize = os.path.getsize(self.path)
+            if self._sha1 is None:
+                self._sha1 = hashlib.sha1()
+                self._sha1_offset = 0
+            sha1 = self._sha1
+            # resume where a previous computation left off, if the file
+            # has grown since (see refresh)
+            video.seek(self._sha1_offset)
+            totalsize = os.path.getsize(self.path) - self._sha1_offset
             chunksize = self._SHA_CHUNK_SIZE
 
             if print_progress:
                 pbar = util.ProgressBar(totalsize)
             for chunk in iter(lambda: video.read(chunksize), b''):
                 sha1.update(chunk)
+                self._sha1_offset += len(chunk)
                 if print_progress:
                     pbar.update(chunksize)
             if print_progress:
@@ -762,6 +1100,131 @@ class Video(object):
             self.__dp("left StoryBoard._get_sha1sum")
             return self.sha1sum
 
+    def _get_keyframes(self, print_progress=False):
+        """Get keyframe timestamps of the first video stream.
+
+        In addition to returning the timestamps, they are also stored in
+        the `keyframes` attribute for future requests, and the
+        corresponding byte positions (``None`` where unknown) are stored
+        in the private attribute `_keyframe_positions`.
+
+        Parameters
+        ----------
+        print_progress : bool
+            Whether to print progress information (to stderr). Default
+            is False.
+
+        Returns
+        -------
+        keyframes : list
+            Sorted keyframe timestamps in seconds.
+
+        Raises
+        ------
+        OSError
+            If the ffprobe call returns with nonzero status.
+
+        """
+
+        self.__dp("entered StoryBoard._get_keyframes")
+        # directly return if already computed
+        if self.keyframes is not None:
+            self.__dp("left StoryBoard._get_keyframes")
+            return self.keyframes
+
+        if self.stream is not None:
+            # can't scan a stream without consuming it
+            self.keyframes = []
+            self._keyframe_positions = []
+            self.__dp("left StoryBoard._get_keyframes")
+            return self.keyframes
+
+        if print_progress:
+            sys.stderr.write("Building keyframe index...\n")
+
+        keyframes = self._scan_keyframes()
+        keyframes.sort()
+        self.keyframes = [timestamp for timestamp, _ in keyframes]
+        self._keyframe_positions = [position for _, position in keyframes]
+        self.__dp("left StoryBoard._get_keyframes")
+        return self.keyframes
+
+    def _scan_keyframes(self, start=None):
+        """Scan the packets of the first video stream for keyframes.
+
+        Parameters
+        ----------
+        start : float, optional
+            Timestamp (relative to the start of the video) to start the
+            scan from, instead of the start of the file. The scan
+            actually starts from the keyframe at or before it.
+
+        Returns
+        -------
+        keyframes : list
+            Unsorted list of tuples ``(timestamp, position)``, where
+            `position` is ``None`` if unknown.
+
+        Raises
+        ------
+        OSError
+            If the ffprobe call returns with nonzero status.
+
+        """
+
+        # ffmpeg seeks relative to the start time of the file
+        if 'start_time' in self._ffprobe['format']:
+            start_time = float(self._ffprobe['format']['start_time'])
+        else:
+            start_time = 0.0
+
+        ffprobe_args = [
+            self._ffprobe_bin,
+            '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,dts_time,pos,flags',
+            '-print_format', 'compact=print_section=0',
+        ]
+        if start is not None:
+            # read_intervals is in terms of the timestamps of the file
+            ffprobe_args += ['-read_intervals', '%s%%' % (start + start_time)]
+        ffprobe_args.append(self.path)
+        proc = subprocess.Popen(ffprobe_args,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        keyframes = []
+        for line in iter(proc.stdout.readline, b''):
+            # each line looks like
+            #     pts_time=10.000000|dts_time=9.920000|pos=53199|flags=K__
+            packet = dict(field.split('=', 1) for field in
+                          line.decode('utf-8', 'ignore').strip().split('|')
+                          if '=' in field)
+            if not packet.get('flags', '').startswith('K'):
+                continue
+            for key in ('pts_time', 'dts_time'):
+                try:
+                    # ffprobe prints microseconds; round off the float
+                    # error so that seeking to the timestamp lands on
+                    # the keyframe itself, not the one before
+                    timestamp = round(float(packet[key]) - start_time, 6)
+                    break
+                except (KeyError, ValueError):
+                    # N/A
+                    pass
+            else:
+                continue
+            try:
+                position = int(packet['pos'])
+            except (KeyError, ValueError):
+                position = None
+            keyframes.append((timestamp, position))
+        _, ffprobe_err = proc.communicate()
+        if proc.returncode != 0:
+            msg = ("ffprobe failed to scan packets of '%s'\n"
+                   "ffprobe error message:\n%s" %
+                   (self.path, ffprobe_err.decode('utf-8', 'ignore').strip()))
+            raise OSError(msg)
+        return keyframes
+
     def _get_scan_type(self, ffprobe_bin, print_progress=False):
         """Determine the scan type of the video.
 
@@ -823,15 +1286,31 @@ class Video(object):
         if print_progress:
             sys.stderr.write("Trying to determine scan type...\n")
 
+        if self.stream is not None:
+            input_path = 'pipe:0'
+        elif self.playlist is not None:
+            input_path = self.playlist.segments[0].path
+        else:
+            input_path = self.path
         ffprobe_args = [
             ffprobe_bin,
             '-select_streams', 'v',
             '-show_frames',
             '-print_format', 'json',
-            self.path,
+            input_path,
         ]
-        proc = subprocess.Popen(ffprobe_args,
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        proc = subprocess.Popen(
+            ffprobe_args,
+            stdin=subprocess.PIPE if self.stream is not None else None,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if self.stream is not None:
+            # the head of the stream is fed from a separate thread,
+            # since ffprobe is terminated as soon as enough frames are
+            # read
+            feeder = threading.Thread(target=_feed_quietly,
+                                      args=(proc.stdin, self._stream_head))
+            feeder.daemon = True
+            feeder.start()
         lines = iter(proc.stdout.readline, b'')
 
         # skip two lines:
@@ -862,7 +1341,12 @@ class Video(object):
                 obj_str = ''
                 if len(objs) >= 40:
                     proc.terminate()
-                    proc.communicate()
+                    # stdin of a stream is owned by the feeder thread,
+                    # so the pipes are closed by hand rather than
+                    # through communicate()
+                    proc.stdout.close()
+                    proc.stderr.close()
+                    proc.wait()
                     break
             except ValueError:
                 # incomplete frame object
@@ -954,6 +1438,11 @@ class Video(object):
                 stream.info_string = 'Data'
 
         stream.index = stream_dict['index']
+        if 'codec_name' in stream_dict:
+            stream.codec_name = stream_dict['codec_name']
+        if 'disposition' in stream_dict:
+            stream.attached_pic = bool(
+                stream_dict['disposition'].get('attached_pic', 0))
 
         self.__dp("left StoryBoard._process_stream")
         return stream
@@ -1252,6 +1741,32 @@ class Video(object):
             sys.stderr.flush()
 
 
+def _read_head(stream, size):
+    """Read up to `size` bytes off a stream (less only at EOF)."""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def _feed_quietly(pipe, data):
+    """Write data to a pipe and close it, even if the reader is gone."""
+    try:
+        pipe.write(data)
+    except (IOError, OSError):
+        pass
+    finally:
+        try:
+            pipe.close()
+        except (IOError, OSError):
+            pass
+
+
 def main():
     """CLI interface."""
 
@@ -1275,7 +1790,8 @@ def main():
     parser = argparse.ArgumentParser(description=description)
     parser.add_argument(
         'videos', nargs='+', metavar='VIDEO',
-        help="Path(s) to the video file(s).")
+        help="""Path(s) to the video file(s). '-' reads a video from
+        stdin.""")
     parser.add_argument(
         '--ffprobe-bin', metavar='NAME',
         help="""The name/path of the ffprobe binary. The binay is
@@ -1348,6 +1864,8 @@ def main():
     returncode = 0
     for video in cli_args.videos:
         # pylint: disable=invalid-name
+        if video == '-':
+            video = getattr(sys.stdin, 'buffer', sys.stdin)
         try:
             v = Video(video, params={
                 'ffprobe_bin': ffprobe_bin,
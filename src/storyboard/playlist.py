@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+"""Handle local segmented media (HLS playlists).
+
+Classes
+-------
+.. autosummary::
+    Segment
+    Playlist
+
+Routines
+--------
+.. autosummary::
+    is_playlist
+
+----
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+import collections
+import io
+import json
+import os
+import subprocess
+
+from storyboard.cache import file_identity as _file_identity
+
+
+# maximum number of segment probe results kept around by probe_segment;
+# enough for a few long playlists
+_MAX_PROBE_CACHE_ENTRIES = 4096
+
+# (segment identity) -> parsed ffprobe output, in LRU order
+_probe_cache = collections.OrderedDict()
+
+
+def is_playlist(path):
+    """Tell whether a file is a local HLS media playlist.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+
+    Returns
+    -------
+    bool
+        ``True`` if the file has an ``.m3u8`` or ``.m3u`` extension and
+        starts with the ``#EXTM3U`` tag.
+
+    """
+
+    if os.path.splitext(path)[1].lower() not in ('.m3u8', '.m3u'):
+        return False
+    try:
+        with io.open(path, 'r', encoding='utf-8-sig') as fileobj:
+            return fileobj.readline().strip() == '#EXTM3U'
+    except (IOError, OSError, UnicodeDecodeError):
+        return False
+
+
+class Segment(object):
+    """A media segment of a playlist.
+
+    Parameters
+    ----------
+    path : str
+        Absolute path to the segment file.
+    start : float
+        Start time of the segment within the playlist, in seconds.
+    duration : float
+        Duration of the segment in seconds, as announced by the
+        playlist.
+
+    Attributes
+    ----------
+    path : str
+    start : float
+    duration : float
+
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, path, start, duration):
+        self.path = path
+        self.start = start
+        self.duration = duration
+
+
+class Playlist(object):
+    """Local HLS media playlist.
+
+    Only media playlists referring to local segment files (relative to
+    the playlist, or absolute) are supported; master playlists, remote
+    segments, encrypted segments and byte range segments are not.
+
+    Parameters
+    ----------
+    path : str
+        Path to the playlist file.
+
+    Raises
+    ------
+    OSError
+        If the playlist cannot be read, is not a supported media
+        playlist, or refers to a segment that doesn't exist.
+
+    Attributes
+    ----------
+    path : str
+        Absolute path to the playlist.
+    segments : list
+        List of `Segment` objects, in playback order.
+    duration : float
+        Total duration of the segments, in seconds.
+
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.segments = []
+        self.duration = 0.0
+        self._parse()
+
+    def _parse(self):
+        """Parse the playlist into `segments`."""
+        base_dir = os.path.dirname(self.path)
+        try:
+            with io.open(self.path, 'r', encoding='utf-8-sig') as fileobj:
+                lines = [line.strip() for line in fileobj]
+        except (IOError, UnicodeDecodeError) as err:
+            raise OSError("cannot read playlist '%s': %s" % (self.path, err))
+        if not lines or lines[0] != '#EXTM3U':
+            raise OSError("'%s' is not an M3U playlist" % self.path)
+
+        segment_duration = None
+        for line in lines[1:]:
+            if not line:
+                continue
+            if line.startswith('#EXTINF:'):
+                try:
+                    segment_duration = float(
+                        line[len('#EXTINF:'):].split(',', 1)[0])
+                except ValueError:
+                    raise OSError("malformed #EXTINF tag in '%s': %s" %
+                                  (self.path, line))
+            elif line.startswith('#EXT-X-STREAM-INF'):
+                raise OSError("'%s' is a master playlist" % self.path)
+            elif (line.startswith('#EXT-X-BYTERANGE') or
+                  (line.startswith('#EXT-X-KEY') and
+                   'METHOD=NONE' not in line)):
+                raise OSError("unsupported playlist feature in '%s': %s" %
+                              (self.path, line))
+            elif line.startswith('#'):
+                # other tags and comments
+                continue
+            else:
+                if segment_duration is None:
+                    raise OSError("segment '%s' in '%s' has no #EXTINF tag" %
+                                  (line, self.path))
+                if '://' in line:
+                    raise OSError("remote segment '%s' in '%s' is not "
+                                  "supported" % (line, self.path))
+                segment_path = os.path.join(base_dir, line)
+                if not os.path.exists(segment_path):
+                    raise OSError("segment '%s' does not exist" %
+                                  segment_path)
+                self.segments.append(Segment(segment_path, self.duration,
+                                             segment_duration))
+                self.duration += segment_duration
+                segment_duration = None
+        if not self.segments:
+            raise OSError("playlist '%s' has no segments" % self.path)
+
+    def locate(self, timestamp):
+        """Map a timestamp of the playlist to a segment.
+
+        Parameters
+        ----------
+        timestamp : float
+            Timestamp within the playlist, in seconds.
+
+        Returns
+        -------
+        segment : Segment
+            The segment playing at `timestamp` (the first or last one,
+            if `timestamp` is out of range).
+        offset : float
+            Timestamp relative to the start of `segment`, in seconds.
+
+        """
+
+        starts = [segment.start for segment in self.segments]
+        index = max(bisect.bisect_right(starts, timestamp) - 1, 0)
+        segment = self.segments[index]
+        return segment, timestamp - segment.start
+
+    def size(self):
+        """Return the total size of the segment files in bytes."""
+        return sum(os.path.getsize(segment.path) for segment in self.segments)
+
+    @staticmethod
+    def probe_segment(segment, ffprobe_bin):
+        """Probe a segment with ffprobe, caching the result.
+
+        Results are cached (for the lifetime of the process) by the
+        identity of the segment file (see
+        ``storyboard.cache.file_identity``), so that probing the
+        segments of a playlist again, e.g., for a new ``Video`` object
+        of the same playlist, doesn't spawn any process.
+
+        Parameters
+        ----------
+        segment : Segment
+        ffprobe_bin : str
+            Name/path of the ffprobe binary.
+
+        Returns
+        -------
+        ffprobe : dict
+            Parsed JSON output of ``ffprobe -show_format
+            -show_streams``.
+
+        Raises
+        ------
+        OSError
+            If ffprobe fails.
+
+        """
+
+        identity = _file_identity(segment.path)
+        if identity in _probe_cache:
+            result = _probe_cache.pop(identity)
+            _probe_cache[identity] = result
+            return result
+
+        ffprobe_args = [
+            ffprobe_bin,
+            '-print_format', 'json',
+            '-show_format', '-show_streams',
+            '-hide_banner',
+            segment.path,
+        ]
+        proc = subprocess.Popen(ffprobe_args,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        ffprobe_out, ffprobe_err = proc.communicate()
+        if proc.returncode != 0:
+            msg = ("ffprobe failed on '%s'\nffprobe error message:\n%s" %
+                   (segment.path,
+                    ffprobe_err.decode('utf-8', 'ignore').strip()))
+            raise OSError(msg)
+        result = json.loads(ffprobe_out.decode('utf-8', 'ignore'))
+        _probe_cache[identity] = result
+        while len(_probe_cache) > _MAX_PROBE_CACHE_ENTRIES:
+            _probe_cache.popitem(last=False)
+        return result
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+from __future__ import division
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from storyboard.cache import *
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='storyboard-test-')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_file_identity(self):
+        fd, path = tempfile.mkstemp(prefix='storyboard-test-')
+        os.close(fd)
+        try:
+            identity = file_identity(path)
+            self.assertEqual(file_identity(path), identity)
+            with open(path, 'wb') as fileobj:
+                fileobj.write(b'modified')
+            self.assertNotEqual(file_identity(path), identity)
+        finally:
+            os.remove(path)
+        with self.assertRaises(OSError):
+            file_identity(path)
+
+    def test_key(self):
+        key = FrameCache.key('video', 1.5, {'size': (160, 90)})
+        self.assertEqual(key,
+                         FrameCache.key('video', 1.5, {'size': (160, 90)}))
+        self.assertNotEqual(key, FrameCache.key('other', 1.5,
+                                                {'size': (160, 90)}))
+        self.assertNotEqual(key, FrameCache.key('video', 2.5,
+                                                {'size': (160, 90)}))
+        self.assertNotEqual(key, FrameCache.key('video', 1.5,
+                                                {'size': (320, 180)}))
+        self.assertNotEqual(key, FrameCache.key('video', 1.5))
+
+    def test_get_put(self):
+        cache = FrameCache(self.cache_dir)
+        key = FrameCache.key('video', 1.5)
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(cache.has(key))
+        image = Image.new('RGB', (16, 9), 'pink')
+        cache.put(key, image)
+        self.assertTrue(cache.has(key))
+        cached_image = cache.get(key)
+        self.assertEqual(cached_image.size, (16, 9))
+        self.assertEqual(cached_image.getpixel((0, 0)), image.getpixel((0, 0)))
+        # overwrite
+        cache.put(key, Image.new('RGB', (16, 9), 'black'))
+        self.assertEqual(cache.get(key).getpixel((0, 0)), (0, 0, 0))
+        # shared between instances
+        self.assertIsNotNone(FrameCache(self.cache_dir).get(key))
+        with self.assertRaises(ValueError):
+            FrameCache(self.cache_dir, params={'max_size': -1})
+
+    def test_trim(self):
+        cache = FrameCache(self.cache_dir)
+        keys = [FrameCache.key('video', timestamp) for timestamp in range(4)]
+        for index, key in enumerate(keys):
+            cache.put(key, Image.new('RGB', (64, 36), 'pink'))
+            # make the first entry the least recently used
+            entry_path = cache._entry_path(key)
+            os.utime(entry_path, (1000000000 + index, 1000000000 + index))
+        entry_size = os.path.getsize(cache._entry_path(keys[0]))
+        self.assertEqual(cache.trim(), 0)
+        # a hit makes an entry the most recently used
+        self.assertIsNotNone(cache.get(keys[0]))
+        cache.max_size = entry_size * 2
+        self.assertEqual(cache.trim(), 2)
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNone(cache.get(keys[2]))
+        self.assertIsNotNone(cache.get(keys[3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,6 +19,10 @@ class TestFFlocate(unittest.TestCase):
         self.assertTrue(check_bins((None, None)))
         with self.assertRaises(OSError):
             check_bins(('', ''))
+        # successes are remembered, failures are not
+        self.assertTrue(check_bins(guess_bins()))
+        with self.assertRaises(OSError):
+            check_bins(('', ''))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+
+from __future__ import division
+
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+
+from PIL import Image, ImageChops
+
+from storyboard import fflocate
+from storyboard.frame import *
+
+
+class TestFrame(unittest.TestCase):
+
+    def setUp(self):
+        # create video file
+        fd, self.videofile = tempfile.mkstemp(prefix='storyboard-test-',
+                                              suffix='.mkv')
+        os.close(fd)
+        bins = fflocate.guess_bins()
+        fflocate.check_bins(bins)  # error if bins do not exist
+        self.ffmpeg_bin, self.ffprobe_bin = bins
+        with open(os.devnull, 'wb') as devnull:
+            command = [
+                self.ffmpeg_bin,
+                # video stream (320x180, test pattern with a running
+                # counter, so that frames at different timestamps
+                # differ)
+                '-f', 'lavfi',
+                '-i', 'testsrc=s=320x180:r=25:d=10',
+                # a keyframe every two seconds
+                '-g', '50',
+                # output option
+                '-y', self.videofile
+            ]
+            subprocess.check_call(command, stdout=devnull, stderr=devnull)
+
+    def tearDown(self):
+        os.remove(self.videofile)
+
+    def assertSameImage(self, image1, image2):
+        self.assertEqual(image1.size, image2.size)
+        diff = ImageChops.difference(image1.convert('RGB'),
+                                     image2.convert('RGB'))
+        self.assertIsNone(diff.getbbox())
+
+    def assertDifferentImage(self, image1, image2):
+        diff = ImageChops.difference(image1.convert('RGB'),
+                                     image2.convert('RGB'))
+        self.assertIsNotNone(diff.getbbox())
+
+    def test_extract_frame(self):
+        frame = extract_frame(self.videofile, 5.0, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+        })
+        self.assertIsInstance(frame, Frame)
+        self.assertEqual(frame.timestamp, 5.0)
+        self.assertEqual(frame.image.size, (320, 180))
+        with self.assertRaises(OSError):
+            extract_frame(self.videofile + '.nonexistent', 5.0)
+        # raw video transport
+        raw_frame = extract_frame(self.videofile, 5.0, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'transport': 'rawvideo',
+            'size': (320, 180),
+        })
+        self.assertEqual(raw_frame.image.mode, 'RGB')
+        self.assertSameImage(raw_frame.image, frame.image)
+        with self.assertRaises(ValueError):
+            extract_frame(self.videofile, 5.0, params={
+                'transport': 'rawvideo',
+            })
+        # keyframes only
+        keyframe = extract_frame(self.videofile, 5.0, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'keyframes_only': True,
+        })
+        expected = extract_frame(self.videofile, 4.0, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+        })
+        self.assertSameImage(keyframe.image, expected.image)
+        # turbo decode profile
+        turbo_frame = extract_frame(self.videofile, 5.0, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'decode_profile': 'turbo',
+        })
+        self.assertEqual(turbo_frame.image.size, (320, 180))
+        # JPEG draft decoding
+        draft_frame = extract_frame(self.videofile, 5.0, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'codec': 'mjpeg',
+            'size': (100, 56),
+            'draft': True,
+        })
+        self.assertEqual(draft_frame.image.size, (100, 56))
+        self.assertEqual(draft_frame.image.mode, 'RGB')
+
+    def test_iter_frames(self):
+        timestamps = [0.5, 2.5, 4.5, 6.5, 8.5]
+        frames = list(iter_frames(self.videofile, timestamps, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'frames_per_process': 2,
+        }))
+        self.assertEqual([frame.timestamp for frame in frames], timestamps)
+        for frame in frames:
+            expected = extract_frame(self.videofile, frame.timestamp, params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+            })
+            self.assertSameImage(frame.image, expected.image)
+        self.assertDifferentImage(frames[0].image, frames[1].image)
+
+        # raw video transport
+        raw_frames = list(iter_frames(self.videofile, timestamps, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'transport': 'rawvideo',
+            'size': (320, 180),
+        }))
+        for frame, raw_frame in zip(frames, raw_frames):
+            self.assertSameImage(frame.image, raw_frame.image)
+        with self.assertRaises(OSError):
+            list(iter_frames(self.videofile, [1.0, 100.0], params={
+                'transport': 'rawvideo',
+                'size': (320, 180),
+            }))
+        # JPEG stream, split into frames, with and without draft
+        # decoding
+        for draft in (False, True):
+            params = {
+                'ffmpeg_bin': self.ffmpeg_bin,
+                'codec': 'mjpeg',
+                'size': (100, 56),
+                'draft': draft,
+            }
+            jpeg_frames = list(iter_frames(self.videofile, timestamps,
+                                           params=params))
+            self.assertEqual([frame.timestamp for frame in jpeg_frames],
+                             timestamps)
+            for jpeg_frame in jpeg_frames:
+                self.assertEqual(jpeg_frame.image.size, (100, 56))
+                expected = extract_frame(self.videofile, jpeg_frame.timestamp,
+                                         params=params)
+                self.assertSameImage(jpeg_frame.image, expected.image)
+
+        # concurrent jobs
+        parallel_frames = list(iter_frames(self.videofile, timestamps, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'jobs': 3,
+        }))
+        self.assertEqual([frame.timestamp for frame in parallel_frames],
+                         timestamps)
+        for frame, parallel_frame in zip(frames, parallel_frames):
+            self.assertSameImage(frame.image, parallel_frame.image)
+        with self.assertRaises(OSError):
+            list(iter_frames(self.videofile, [1.0, 2.0, 100.0, 3.0], params={
+                'jobs': 4,
+            }))
+        with self.assertRaises(ValueError):
+            list(iter_frames(self.videofile, timestamps, params={'jobs': 0}))
+        # more batches than the lookahead window of the workers
+        timestamps = [0.5 + 0.5 * i for i in range(16)]
+        windowed_frames = list(iter_frames(self.videofile, timestamps, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'frames_per_process': 1,
+            'jobs': 2,
+        }))
+        self.assertEqual([frame.timestamp for frame in windowed_frames],
+                         timestamps)
+        timestamps = [0.5, 2.5, 4.5, 6.5, 8.5]
+
+        # frame by frame
+        frames = list(iter_frames(self.videofile, [1.0, 3.0], params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'frame_by_frame': True,
+        }))
+        self.assertEqual(len(frames), 2)
+        expected = extract_frame(self.videofile, 3.0, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'frame_by_frame': True,
+        })
+        self.assertSameImage(frames[1].image, expected.image)
+        # hybrid seeking
+        hybrid_frames = list(iter_frames(self.videofile, [1.0, 7.3], params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'frame_by_frame': True,
+            'seek_margin': 2.0,
+            'jobs': 2,
+        }))
+        for hybrid_frame in hybrid_frames:
+            expected = extract_frame(
+                self.videofile, hybrid_frame.timestamp, params={
+                    'ffmpeg_bin': self.ffmpeg_bin,
+                    'frame_by_frame': True,
+                })
+            self.assertSameImage(hybrid_frame.image, expected.image)
+        with self.assertRaises(OSError):
+            extract_frame(self.videofile, 100.0, params={
+                'frame_by_frame': True,
+                'seek_margin': 2.0,
+            })
+
+        # keyframes only
+        keyframes = list(iter_frames(self.videofile, [1.0, 5.0], params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'transport': 'rawvideo',
+            'size': (320, 180),
+            'keyframes_only': True,
+        }))
+        self.assertEqual(len(keyframes), 2)
+        for keyframe, timestamp in zip(keyframes, [0.0, 4.0]):
+            expected = extract_frame(self.videofile, timestamp, params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+            })
+            self.assertSameImage(keyframe.image, expected.image)
+
+        # turbo decode profile and lowres decoding
+        turbo_frames = list(iter_frames(self.videofile, timestamps, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'transport': 'rawvideo',
+            'size': (160, 90),
+            'decode_profile': 'turbo',
+            'lowres': 1,
+        }))
+        self.assertEqual([frame.image.size for frame in turbo_frames],
+                         [(160, 90)] * len(timestamps))
+        with self.assertRaises(ValueError):
+            list(iter_frames(self.videofile, timestamps, params={
+                'decode_profile': 'fast',
+            }))
+
+        # extraction in byte offset order, output in timestamp order
+        timestamps = [0.5, 2.5, 4.5, 6.5, 8.5]
+        byte_ranges = [(4000, 1000), (3000, 1000), (2000, 1000),
+                       (1000, 1000), (0, 1000)]
+        for jobs in [1, 2]:
+            ordered_frames = list(iter_frames(
+                self.videofile, timestamps, params={
+                    'ffmpeg_bin': self.ffmpeg_bin,
+                    'frames_per_process': 2,
+                    'byte_ranges': byte_ranges,
+                    'jobs': jobs,
+                }))
+            self.assertEqual([frame.timestamp for frame in ordered_frames],
+                             timestamps)
+            for frame in ordered_frames:
+                expected = extract_frame(
+                    self.videofile, frame.timestamp, params={
+                        'ffmpeg_bin': self.ffmpeg_bin,
+                    })
+                self.assertSameImage(frame.image, expected.image)
+        with self.assertRaises(ValueError):
+            list(iter_frames(self.videofile, timestamps, params={
+                'byte_ranges': byte_ranges[1:],
+            }))
+
+        # stop iterating early
+        frames = iter_frames(self.videofile, timestamps)
+        next(frames)
+        frames.close()
+
+        # out of range
+        with self.assertRaises(OSError):
+            list(iter_frames(self.videofile, [1.0, 100.0]))
+
+    def test_batch_extract_frames(self):
+        params = {
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'transport': 'rawvideo',
+            'size': (160, 90),
+            'frames_per_process': 3,
+        }
+        frame_lists = batch_extract_frames([
+            (self.videofile, [1.0, 5.0]),
+            (self.videofile + '.nonexistent', [1.0]),
+            (self.videofile, [2.0, 6.0, 9.0]),
+            (self.videofile, [3.0, 100.0]),
+        ], params=params)
+        self.assertEqual(len(frame_lists), 4)
+        self.assertEqual([frame.timestamp for frame in frame_lists[0]],
+                         [1.0, 5.0])
+        self.assertEqual([frame.timestamp for frame in frame_lists[2]],
+                         [2.0, 6.0, 9.0])
+        for frame in frame_lists[0] + frame_lists[2]:
+            expected = extract_frame(self.videofile, frame.timestamp,
+                                     params=params)
+            self.assertSameImage(frame.image, expected.image)
+        # errors are attributed to the right videos
+        self.assertIsInstance(frame_lists[1], OSError)
+        self.assertIsInstance(frame_lists[3], OSError)
+        # without a common size, videos are processed separately
+        frame_lists = batch_extract_frames([
+            (self.videofile, [1.0]),
+            (self.videofile, [2.0, 3.0]),
+        ], params={'ffmpeg_bin': self.ffmpeg_bin, 'jobs': 2})
+        self.assertEqual([len(frames) for frames in frame_lists], [1, 2])
+
+    def test_extract_frame_grid(self):
+        timestamps = [0.5, 2.5, 4.5, 6.5, 8.5, 9.5]
+        grid = extract_frame_grid(self.videofile, timestamps, (3, 2),
+                                  params={
+                                      'ffmpeg_bin': self.ffmpeg_bin,
+                                      'size': (160, 90),
+                                      'tile_spacing': (8, 6),
+                                      'background_color': 'pink',
+                                  })
+        self.assertEqual(grid.mode, 'RGB')
+        self.assertEqual(grid.size, (160 * 3 + 8 * 2, 90 * 2 + 6))
+        frames = list(iter_frames(self.videofile, timestamps, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'transport': 'rawvideo',
+            'size': (160, 90),
+        }))
+        for index, frame in enumerate(frames):
+            row, col = divmod(index, 3)
+            x, y = col * (160 + 8), row * (90 + 6)
+            self.assertSameImage(grid.crop((x, y, x + 160, y + 90)),
+                                 frame.image)
+        self.assertEqual(grid.getpixel((160, 0)), (255, 192, 203))
+        with self.assertRaises(ValueError):
+            extract_frame_grid(self.videofile, timestamps[1:], (3, 2),
+                               params={'size': (160, 90)})
+        with self.assertRaises(OSError):
+            extract_frame_grid(self.videofile, [1.0, 100.0], (2, 1),
+                               params={'size': (160, 90)})
+
+    def test_render_audio_strip(self):
+        fd, audiofile = tempfile.mkstemp(prefix='storyboard-test-',
+                                         suffix='.mka')
+        os.close(fd)
+        try:
+            with open(os.devnull, 'wb') as devnull:
+                subprocess.check_call([
+                    self.ffmpeg_bin,
+                    '-f', 'lavfi', '-i', 'sine=d=2',
+                    '-i', self.videofile,
+                    '-map', '0:a', '-map', '1:v', '-frames:v', '1',
+                    '-c:v', 'png', '-disposition:v', 'attached_pic',
+                    '-y', audiofile,
+                ], stdout=devnull, stderr=devnull)
+            strip = render_audio_strip(audiofile, (400, 100), params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+                'background_color': 'pink',
+            })
+            self.assertEqual(strip.mode, 'RGB')
+            self.assertEqual(strip.size, (400, 100))
+            # the sine wave doesn't reach the top
+            self.assertEqual(strip.getpixel((200, 0)), (255, 192, 203))
+            strip = render_audio_strip(audiofile, (400, 100), params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+                'mode': 'spectrogram',
+                'cover': True,
+                'spacing': 8,
+                'background_color': 'pink',
+            })
+            self.assertEqual(strip.size, (400, 100))
+            # the 16:9 cover art is letterboxed
+            self.assertEqual(strip.getpixel((50, 0)), (255, 192, 203))
+            self.assertEqual(strip.getpixel((104, 50)), (255, 192, 203))
+            with self.assertRaises(ValueError):
+                render_audio_strip(audiofile, (400, 100),
+                                   params={'mode': 'oscilloscope'})
+        finally:
+            os.remove(audiofile)
+
+    def test_sample_stream_frames(self):
+        def chunks():
+            with open(self.videofile, 'rb') as fileobj:
+                for chunk in iter(lambda: fileobj.read(4096), b''):
+                    consumed.append(len(chunk))
+                    yield chunk
+
+        # known duration
+        consumed = []
+        frames, duration = sample_stream_frames(chunks(), 5, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'size': (160, 90),
+            'duration': 10.0,
+        })
+        self.assertEqual(duration, 10.0)
+        self.assertEqual([frame.timestamp for frame in frames],
+                         [1.0, 3.0, 5.0, 7.0, 9.0])
+        self.assertEqual(sum(consumed), os.path.getsize(self.videofile))
+        for frame in frames:
+            self.assertEqual(frame.image.size, (160, 90))
+        self.assertSameImage(frames[1].image, extract_frame(
+            self.videofile, 3.0, params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+                'size': (160, 90),
+            }).image)
+        # unknown duration, sampled every second and decimated
+        consumed = []
+        frames, duration = sample_stream_frames(chunks(), 4, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'size': (160, 90),
+        })
+        self.assertAlmostEqual(duration, 10.0)
+        self.assertEqual(len(frames), 4)
+        timestamps = [frame.timestamp for frame in frames]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(sum(consumed), os.path.getsize(self.videofile))
+        with self.assertRaises(OSError):
+            sample_stream_frames(iter([b'garbage']), 4, params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+                'size': (160, 90),
+            })
+        with self.assertRaises(ValueError):
+            sample_stream_frames(chunks(), 4)
+
+    def test_select_scene_frames(self):
+        fd, cutsfile = tempfile.mkstemp(prefix='storyboard-test-',
+                                        suffix='.mkv')
+        os.close(fd)
+        try:
+            with open(os.devnull, 'wb') as devnull:
+                # cuts at 2.6 and 7.6 seconds
+                subprocess.check_call([
+                    self.ffmpeg_bin,
+                    '-f', 'lavfi', '-i',
+                    'color=c=red:s=320x180:r=25:d=2.6[a];'
+                    'color=c=lime:s=320x180:r=25:d=5[b];'
+                    'color=c=blue:s=320x180:r=25:d=2.4[c];'
+                    '[a][b][c]concat=n=3',
+                    '-y', cutsfile,
+                ], stdout=devnull, stderr=devnull)
+            frames, scores = select_scene_frames(cutsfile, 4, params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+                'size': (160, 90),
+                'duration': 10.0,
+            })
+            self.assertEqual(len(frames), 4)
+            # the cuts win their sections; the frames closest to the
+            # middle (within a quarter section) stand in for the
+            # sections without cuts
+            self.assertIsNone(scores[0])
+            self.assertAlmostEqual(frames[0].timestamp, 1.25, delta=0.625)
+            self.assertGreater(scores[1], 0.3)
+            self.assertAlmostEqual(frames[1].timestamp, 2.6, delta=0.05)
+            self.assertIsNone(scores[2])
+            self.assertAlmostEqual(frames[2].timestamp, 6.25, delta=0.625)
+            self.assertGreater(scores[3], 0.3)
+            self.assertAlmostEqual(frames[3].timestamp, 7.6, delta=0.05)
+            colors = [frame.image.getpixel((80, 45)) for frame in frames]
+            for color, expected in zip(colors, [(255, 0, 0), (0, 255, 0),
+                                                (0, 255, 0), (0, 0, 255)]):
+                for channel, expected_channel in zip(color, expected):
+                    self.assertAlmostEqual(channel, expected_channel,
+                                           delta=8)
+            for frame in frames:
+                self.assertEqual(frame.image.size, (160, 90))
+            with self.assertRaises(ValueError):
+                select_scene_frames(cutsfile, 4, params={
+                    'ffmpeg_bin': self.ffmpeg_bin,
+                    'size': (160, 90),
+                })
+        finally:
+            os.remove(cutsfile)
+
+    def test_screen_frames(self):
+        gradient = Image.linear_gradient('L').resize((160, 90)).convert('RGB')
+        frames = [
+            Frame(0.0, gradient),
+            Frame(1.0, Image.new('RGB', (160, 90), 'black')),
+            Frame(2.0, Image.new('RGB', (160, 90), 'pink')),
+            Frame(3.0, gradient.transpose(Image.FLIP_TOP_BOTTOM)),
+            Frame(4.0, gradient.transpose(Image.FLIP_TOP_BOTTOM)),
+        ]
+        self.assertEqual(screen_frames(frames),
+                         [None, 'black', 'blank', None, 'duplicate'])
+        self.assertEqual(screen_frames(frames, params={
+            'black_threshold': -1,
+            'blank_threshold': -1,
+            'duplicate_threshold': -1,
+        }), [None] * 5)
+        self.assertEqual(screen_frames([]), [])
+
+    def test_find_sharpest_frames(self):
+        fd, blurryfile = tempfile.mkstemp(prefix='storyboard-test-',
+                                          suffix='.mkv')
+        os.close(fd)
+        try:
+            with open(os.devnull, 'wb') as devnull:
+                # blurred during the first half of every two seconds
+                subprocess.check_call([
+                    self.ffmpeg_bin, '-i', self.videofile,
+                    '-vf', "boxblur=10:enable='lt(mod(t,2),1)'",
+                    '-g', '50', '-y', blurryfile,
+                ], stdout=devnull, stderr=devnull)
+            timestamps, scores = find_sharpest_frames(
+                blurryfile, [1.0, 3.0, 9.9], params={
+                    'ffmpeg_bin': self.ffmpeg_bin,
+                    'size': (160, 90),
+                    'candidates': 5,
+                    'window': 1.0,
+                })
+            self.assertEqual(len(timestamps), 3)
+            for timestamp, center in zip(timestamps[:2], [1.0, 3.0]):
+                self.assertGreaterEqual(timestamp, center)
+                self.assertLess(timestamp, center + 0.5)
+                # the actual timestamp of a frame at 25 fps
+                self.assertAlmostEqual(timestamp * 25, round(timestamp * 25))
+            self.assertIsNotNone(scores[0])
+            # the window runs past the end of the video
+            self.assertEqual(timestamps[2], 9.9)
+            self.assertIsNone(scores[2])
+            with self.assertRaises(ValueError):
+                find_sharpest_frames(blurryfile, [1.0], params={
+                    'ffmpeg_bin': self.ffmpeg_bin,
+                    'size': (160, 90),
+                    'candidates': 0,
+                })
+        finally:
+            os.remove(blurryfile)
+
+    def test_timeout(self):
+        # an FFmpeg that never gets past a seek to 5.0 seconds
+        fd, stalling_ffmpeg_bin = tempfile.mkstemp(
+            prefix='storyboard-test-', suffix='.sh')
+        with os.fdopen(fd, 'w') as fileobj:
+            fileobj.write('#!/bin/sh\n'
+                          'case " $* " in\n'
+                          '    *" -ss 5.0 "*) exec sleep 60;;\n'
+                          'esac\n'
+                          'exec "%s" "$@"\n' % self.ffmpeg_bin)
+        os.chmod(stalling_ffmpeg_bin, 0o755)
+        try:
+            params = {
+                'ffmpeg_bin': stalling_ffmpeg_bin,
+                'timeout': 1.0,
+            }
+            with self.assertRaises(OSError):
+                extract_frame(self.videofile, 5.0, params=params)
+            params['hedge_offset'] = 0.5
+            frame = extract_frame(self.videofile, 5.0, params=params)
+            self.assertEqual(frame.timestamp, 4.5)
+            expected = extract_frame(self.videofile, 4.5, params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+            })
+            self.assertSameImage(frame.image, expected.image)
+            # the stalled batch is redone frame by frame
+            frames = list(iter_frames(self.videofile, [1.0, 5.0, 9.0],
+                                      params=params))
+            self.assertEqual([frame.timestamp for frame in frames],
+                             [1.0, 4.5, 9.0])
+            # so is a failed batch
+            frames = list(iter_frames(self.videofile, [1.0, 10.2],
+                                      params=params))
+            self.assertEqual([frame.timestamp for frame in frames],
+                             [1.0, 9.7])
+            # the stalled attempt doesn't outlive a failed hedge for
+            # long
+            start_time = time.time()
+            with self.assertRaises(OSError):
+                extract_frame(self.videofile, 5.0, params={
+                    'ffmpeg_bin': stalling_ffmpeg_bin,
+                    'timeout': 1.0,
+                    'hedge_offset': 10.0,
+                })
+            self.assertLess(time.time() - start_time, 10)
+            # no need to hedge
+            frame = extract_frame(self.videofile, 3.0, params=params)
+            self.assertEqual(frame.timestamp, 3.0)
+            with self.assertRaises(ValueError):
+                extract_frame(self.videofile, 3.0, params={'timeout': 0})
+        finally:
+            os.remove(stalling_ffmpeg_bin)
+
+
+if __name__ == '__main__':
+    unittest.main()
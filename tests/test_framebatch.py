@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+from __future__ import division
+
+import os
+import subprocess
+import tempfile
+import unittest
+
+from PIL import Image, ImageChops
+
+from storyboard import fflocate
+from storyboard.frame import Frame, extract_frame
+
+try:
+    import numpy
+    from storyboard.framebatch import *
+except ImportError:
+    # NumPy is an optional dependency
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestFrameBatch(unittest.TestCase):
+
+    def setUp(self):
+        # create video file
+        fd, self.videofile = tempfile.mkstemp(prefix='storyboard-test-',
+                                              suffix='.mkv')
+        os.close(fd)
+        bins = fflocate.guess_bins()
+        fflocate.check_bins(bins)  # error if bins do not exist
+        self.ffmpeg_bin, self.ffprobe_bin = bins
+        with open(os.devnull, 'wb') as devnull:
+            command = [
+                self.ffmpeg_bin,
+                '-f', 'lavfi',
+                '-i', 'testsrc=s=320x180:r=25:d=10',
+                '-y', self.videofile
+            ]
+            subprocess.check_call(command, stdout=devnull, stderr=devnull)
+
+    def tearDown(self):
+        os.remove(self.videofile)
+
+    def assertSameImage(self, image1, image2):
+        self.assertEqual(image1.size, image2.size)
+        diff = ImageChops.difference(image1.convert('RGB'),
+                                     image2.convert('RGB'))
+        self.assertIsNone(diff.getbbox())
+
+    def test_from_frames(self):
+        gradient = Image.linear_gradient('L').resize((160, 90)).convert('RGB')
+        frames = [
+            Frame(0.0, gradient),
+            Frame(1.0, Image.new('RGB', (160, 90), 'black')),
+            Frame(2.0, Image.new('RGB', (160, 90), 'white')),
+            Frame(3.0, Image.new('RGB', (160, 90), 'white')),
+        ]
+        batch = FrameBatch.from_frames(frames)
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(batch.size, (160, 90))
+        self.assertEqual(batch.array.shape, (4, 90, 160, 3))
+        self.assertEqual(batch.timestamps, [0.0, 1.0, 2.0, 3.0])
+        for index, frame in enumerate(frames):
+            self.assertSameImage(batch.image(index), frame.image)
+        # images are views of the array
+        batch.array[1] = 255
+        self.assertSameImage(batch.frames()[1].image, frames[2].image)
+
+        mean_luma = batch.mean_luma()
+        self.assertAlmostEqual(mean_luma[1], 255, places=2)
+        self.assertAlmostEqual(mean_luma[2], 255, places=2)
+        luma_std = batch.luma_std()
+        self.assertGreater(luma_std[0], 50)
+        self.assertAlmostEqual(luma_std[2], 0, places=2)
+        self.assertEqual(batch.mean_abs_diff().tolist()[1:], [0, 0])
+        laplacian_variance = batch.laplacian_variance()
+        self.assertEqual(laplacian_variance.shape, (4,))
+        self.assertAlmostEqual(laplacian_variance[3], 0, places=2)
+
+        with self.assertRaises(ValueError):
+            FrameBatch.from_frames([])
+        with self.assertRaises(ValueError):
+            FrameBatch.from_frames([
+                frames[0], Frame(1.0, Image.new('RGB', (80, 45)))])
+        with self.assertRaises(ValueError):
+            FrameBatch([0.0], numpy.zeros((1, 90, 160, 3), numpy.float32))
+
+    def test_extract(self):
+        timestamps = [float(second) for second in range(10)] * 2
+        batch = FrameBatch.extract(self.videofile, timestamps, params={
+            'ffmpeg_bin': self.ffmpeg_bin,
+            'size': (160, 90),
+        })
+        self.assertEqual(len(batch), 20)
+        self.assertEqual(batch.array.shape, (20, 90, 160, 3))
+        self.assertSameImage(batch.image(13), extract_frame(
+            self.videofile, 3.0, params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+                'size': (160, 90),
+            }).image)
+        with self.assertRaises(OSError):
+            FrameBatch.extract(self.videofile, [1.0, 100.0], params={
+                'ffmpeg_bin': self.ffmpeg_bin,
+                'size': (160, 90),
+            })
+
+
+if __name__ == '__main__':
+    unittest.main()
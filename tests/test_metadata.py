@@ -3,6 +3,7 @@
 from __future__ import division
 
 import os
+import shutil
 import subprocess
 import sys
 import tempfile
@@ -106,6 +107,7 @@ class TestMetadata(unittest.TestCase):
         self.assertIsNotNone(vstream.info_string)
         self.assertIsNone(vstream.language_code)
         self.assertEqual(vstream.type, 'video')
+        self.assertIsNotNone(vstream.codec_name)
         self.assertEqual(vstream.width, 320)
         # audio stream
         astream = vid.streams[1]
@@ -129,6 +131,127 @@ class TestMetadata(unittest.TestCase):
         })
         self.assertAlmostEqual(vid.duration, 10.0)
         self.assertEqual(humantime(vid.duration), vid.duration_text)
+        # keyframe index is built upon request
+        self.assertIsNone(vid.keyframes)
+        keyframes = vid.compute_keyframes()
+        self.assertEqual(len(keyframes), 1)
+        self.assertAlmostEqual(keyframes[0], 0.0, places=1)
+        self.assertIs(vid.keyframes, keyframes)
+
+    def test_refresh(self):
+        # MPEG-TS segments can be appended to one another, like a
+        # recording that is still being written
+        fd, segmentfile = tempfile.mkstemp(prefix='storyboard-test-',
+                                           suffix='.ts')
+        os.close(fd)
+        tsfile = segmentfile + '.growing.ts'
+        try:
+            with open(os.devnull, 'wb') as devnull:
+                for offset, target in [(0, tsfile), (5, segmentfile)]:
+                    subprocess.check_call([
+                        self.ffmpeg_bin,
+                        '-f', 'lavfi', '-i', 'testsrc=s=320x180:r=25:d=5',
+                        '-g', '50',
+                        '-output_ts_offset', str(offset),
+                        '-y', target,
+                    ], stdout=devnull, stderr=devnull)
+            vid = Video(tsfile, params={'ffprobe_bin': self.ffprobe_bin})
+            self.assertFalse(vid.refresh())
+            vid.compute_sha1sum()
+            keyframes = list(vid.compute_keyframes())
+            duration = vid.duration
+            with open(tsfile, 'ab') as growing, \
+                    open(segmentfile, 'rb') as segment:
+                growing.write(segment.read())
+            self.assertTrue(vid.refresh())
+            self.assertEqual(vid.size, os.path.getsize(tsfile))
+            self.assertGreater(vid.duration, duration + 4)
+            self.assertGreater(len(vid.keyframes), len(keyframes))
+            self.assertEqual(vid.keyframes[:len(keyframes)], keyframes)
+            # the digest is brought up to date
+            self.assertIsNone(vid.sha1sum)
+            fresh_vid = Video(tsfile, params={'ffprobe_bin': self.ffprobe_bin})
+            self.assertEqual(vid.compute_sha1sum(),
+                             fresh_vid.compute_sha1sum())
+            self.assertEqual(vid.keyframes, fresh_vid.compute_keyframes())
+        finally:
+            os.remove(segmentfile)
+            if os.path.exists(tsfile):
+                os.remove(tsfile)
+
+    def test_still_image(self):
+        fd, imagefile = tempfile.mkstemp(prefix='storyboard-test-',
+                                         suffix='.png')
+        os.close(fd)
+        try:
+            with open(os.devnull, 'wb') as devnull:
+                subprocess.check_call([
+                    self.ffmpeg_bin,
+                    '-f', 'lavfi', '-i', 'color=c=pink:s=100x100',
+                    '-frames:v', '1',
+                    '-y', imagefile,
+                ], stdout=devnull, stderr=devnull)
+            image = Video(imagefile, params={'ffprobe_bin': self.ffprobe_bin})
+            self.assertTrue(image.still_image)
+            self.assertIsNone(image.scan_type)
+            self.assertEqual(image.dimension, (100, 100))
+            self.assertFalse(Video(self.videofile, params={
+                'ffprobe_bin': self.ffprobe_bin,
+            }).still_image)
+        finally:
+            os.remove(imagefile)
+
+    def test_stream(self):
+        with open(self.videofile, 'rb') as stream:
+            vid = Video(stream, params={'ffprobe_bin': self.ffprobe_bin})
+            self.assertIsNone(vid.path)
+            self.assertIs(vid.stream, stream)
+            self.assertEqual(vid.filename, os.path.basename(self.videofile))
+            self.assertEqual(vid.format, 'Matroska')
+            self.assertEqual(vid.dimension, (320, 180))
+            self.assertIsNone(vid.size)
+            self.assertEqual(vid.compute_keyframes(), [])
+            self.assertFalse(vid.refresh())
+            chunks = list(vid.iter_stream())
+            self.assertTrue(vid.stream_consumed)
+            self.assertEqual(vid.size, os.path.getsize(self.videofile))
+            with open(self.videofile, 'rb') as fileobj:
+                self.assertEqual(b''.join(chunks), fileobj.read())
+            self.assertEqual(vid.compute_sha1sum(), Video(
+                self.videofile, params={'ffprobe_bin': self.ffprobe_bin},
+            ).compute_sha1sum())
+            with self.assertRaises(OSError):
+                list(vid.iter_stream())
+
+    def test_playlist(self):
+        playlist_dir = tempfile.mkdtemp(prefix='storyboard-test-')
+        playlist_file = os.path.join(playlist_dir, 'index.m3u8')
+        try:
+            with open(os.devnull, 'wb') as devnull:
+                subprocess.check_call([
+                    self.ffmpeg_bin,
+                    '-f', 'lavfi', '-i', 'testsrc=s=320x180:r=25:d=6',
+                    '-g', '50',
+                    '-f', 'hls', '-hls_time', '2', '-hls_list_size', '0',
+                    '-y', playlist_file,
+                ], stdout=devnull, stderr=devnull)
+            vid = Video(playlist_file, params={
+                'ffprobe_bin': self.ffprobe_bin,
+            })
+            self.assertIsNotNone(vid.playlist)
+            self.assertEqual(len(vid.playlist.segments), 3)
+            self.assertEqual(vid.format, 'HTTP Live Streaming playlist')
+            self.assertAlmostEqual(vid.duration, 6.0, places=1)
+            self.assertEqual(vid.size, sum(
+                os.path.getsize(segment.path)
+                for segment in vid.playlist.segments))
+            self.assertEqual(vid.dimension, (320, 180))
+            self.assertEqual(vid.scan_type, 'Progressive scan')
+            self.assertIsNone(Video(self.videofile, params={
+                'ffprobe_bin': self.ffprobe_bin,
+            }).playlist)
+        finally:
+            shutil.rmtree(playlist_dir)
 
     def assertSha1sumIncluded(self):
         # sys.stdout has to support getvalue (e.g., through
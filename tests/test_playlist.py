@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+from __future__ import division
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from storyboard.playlist import *
+
+
+class TestPlaylist(unittest.TestCase):
+
+    def setUp(self):
+        self.playlist_dir = tempfile.mkdtemp(prefix='storyboard-test-')
+        self.playlist_file = os.path.join(self.playlist_dir, 'index.m3u8')
+        for index in range(3):
+            with open(self.segment_path(index), 'wb') as fileobj:
+                fileobj.write(b'\0' * (index + 1) * 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.playlist_dir)
+
+    def segment_path(self, index):
+        return os.path.join(self.playlist_dir, 'segment%d.ts' % index)
+
+    def write_playlist(self, lines):
+        with open(self.playlist_file, 'w') as fileobj:
+            fileobj.write('\n'.join(lines) + '\n')
+
+    def test_playlist(self):
+        self.write_playlist([
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            '#EXT-X-TARGETDURATION:4',
+            '#EXTINF:4.000000,',
+            'segment0.ts',
+            '#EXTINF:4.000000,',
+            'segment1.ts',
+            '#EXTINF:2.500000,',
+            'segment2.ts',
+            '#EXT-X-ENDLIST',
+        ])
+        self.assertTrue(is_playlist(self.playlist_file))
+        self.assertFalse(is_playlist(self.segment_path(0)))
+        playlist = Playlist(self.playlist_file)
+        self.assertEqual([segment.path for segment in playlist.segments],
+                         [self.segment_path(index) for index in range(3)])
+        self.assertEqual([segment.start for segment in playlist.segments],
+                         [0.0, 4.0, 8.0])
+        self.assertAlmostEqual(playlist.duration, 10.5)
+        self.assertEqual(playlist.size(), 600)
+        segment, offset = playlist.locate(5.0)
+        self.assertEqual(segment.path, self.segment_path(1))
+        self.assertAlmostEqual(offset, 1.0)
+        segment, offset = playlist.locate(8.0)
+        self.assertEqual(segment.path, self.segment_path(2))
+        self.assertAlmostEqual(offset, 0.0)
+        segment, offset = playlist.locate(0.0)
+        self.assertEqual(segment.path, self.segment_path(0))
+
+    def test_unsupported_playlist(self):
+        for lines in [
+                ['#EXTM3U'],
+                ['#EXTM3U', 'segment0.ts'],
+                ['#EXTM3U', '#EXTINF:4.0,', 'missing.ts'],
+                ['#EXTM3U', '#EXTINF:4.0,', 'http://example.com/0.ts'],
+                ['#EXTM3U', '#EXT-X-STREAM-INF:BANDWIDTH=1000', 'a.m3u8'],
+                ['#EXTM3U', '#EXT-X-KEY:METHOD=AES-128,URI="key"',
+                 '#EXTINF:4.0,', 'segment0.ts'],
+                ['segment0.ts'],
+        ]:
+            self.write_playlist(lines)
+            with self.assertRaises(OSError):
+                Playlist(self.playlist_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
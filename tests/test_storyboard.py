@@ -4,6 +4,7 @@ from __future__ import division
 
 import imghdr
 import os
+import shutil
 import subprocess
 import tempfile
 import unittest
@@ -11,6 +12,7 @@ import unittest
 from PIL import Image, ImageFont
 
 from storyboard import fflocate
+from storyboard.cache import FrameCache
 from storyboard.frame import Frame
 from storyboard.storyboard import *
 
@@ -166,6 +168,463 @@ class TestStoryBoard(unittest.TestCase):
         # = 1964
         self.assertEqual(board.size[0], 1964)
         board.close()
+        # concurrent frame extraction
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'jobs': 4,
+        })
+        sb.gen_frames(6, params={'jobs': 3})
+        self.assertEqual(len(sb.frames), 6)
+        timestamps = [frame.timestamp for frame in sb.frames]
+        self.assertEqual(timestamps, sorted(timestamps))
+        # full resolution frames unless scaled down explicitly
+        self.assertEqual(sb.frames[0].image.size, (320, 180))
+        sb.gen_frames(6, params={'frame_size': (160, 90)})
+        self.assertEqual(sb.frames[0].image.size, (160, 90))
+        sb.gen_frames(6)
+        self.assertEqual(sb.frames[0].image.size, (320, 180))
+        # JPEG frames decoded at reduced size by Pillow, which implies
+        # the image transport
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'frame_codec': 'mjpeg',
+        })
+        self.assertTrue(sb._plan_frames(4, (80, 45))[3]['draft'])
+        sb.gen_frames(4, params={'frame_size': (80, 45)})
+        self.assertEqual(sb.frames[0].image.size, (80, 45))
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'frame_transport': 'rawvideo',
+            'frame_codec': 'mjpeg',
+        })
+        self.assertFalse(sb._plan_frames(4, (80, 45))[3]['draft'])
+        # seek modes (the only keyframe of the video is at the start)
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'seek_mode': 'keyframe',
+        })
+        sb.gen_frames(4)
+        keyframe = sb.video.keyframes[0]
+        self.assertEqual([frame.timestamp for frame in sb.frames],
+                         [keyframe] * 4)
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'seek_tolerance': 2.0,
+        })
+        sb.gen_frames(4)
+        self.assertEqual(sb.frames[0].timestamp, keyframe)
+        interval = sb.video.duration / 4
+        for i in range(1, 4):
+            self.assertAlmostEqual(sb.frames[i].timestamp,
+                                   interval * (i + 1/2))
+        for seek_tolerance, seek_mode in [(2.0, 'input'), (10.0, 'keyframe')]:
+            sb = StoryBoard(self.videofile, params={
+                'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+                'seek_mode': 'auto',
+                'seek_tolerance': seek_tolerance,
+            })
+            self.assertEqual(sb._get_seek_mode(), seek_mode)
+        # frame pool
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'frame_pool_tolerance': 2.0,
+        })
+        sb.gen_frames(2)
+        old_frames = sb.frames
+        sb.gen_frames(4)
+        # tolerance is capped at half the interval, 1.25 seconds
+        self.assertIs(sb.frames[0], old_frames[0])
+        self.assertIsNot(sb.frames[1], old_frames[0])
+        self.assertIs(sb.frames[2], old_frames[1])
+        self.assertIsNot(sb.frames[3], old_frames[1])
+        timestamps = [frame.timestamp for frame in sb.frames]
+        self.assertEqual(timestamps, sorted(timestamps))
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'frame_pool_size': 0,
+        })
+        sb.gen_frames(2)
+        self.assertEqual(len(sb._frame_pool), 0)
+
+        # frame cache
+        cache_dir = tempfile.mkdtemp(prefix='storyboard-test-')
+        try:
+            frame_cache = FrameCache(cache_dir)
+            sb = StoryBoard(self.videofile, params={
+                'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+                'frame_cache': frame_cache,
+            })
+            sb.gen_frames(4, params={'frame_size': (160, 90)})
+            cached_sb = StoryBoard(self.videofile, params={
+                'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+                'frame_cache': frame_cache,
+                # extraction would fail, so frames have to be cached
+                'frame_transport': 'image',
+                'frame_codec': 'nonexistent',
+            })
+            cached_sb.gen_frames(4, params={'frame_size': (160, 90)})
+            for frame, cached_frame in zip(sb.frames, cached_sb.frames):
+                self.assertEqual(cached_frame.timestamp, frame.timestamp)
+                self.assertEqual(cached_frame.image.tobytes(),
+                                 frame.image.tobytes())
+            with self.assertRaises(OSError):
+                cached_sb.gen_frames(4, params={'frame_size': (320, 180)})
+        finally:
+            shutil.rmtree(cache_dir)
+
+        # hybrid seeking is the default with a given video duration
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'video_duration': 10.0,
+        })
+        self.assertEqual(sb._get_seek_mode(), 'hybrid')
+        sb.gen_frames(2)
+        self.assertEqual(len(sb.frames), 2)
+        with self.assertRaises(ValueError):
+            StoryBoard(self.videofile, params={'seek_mode': 'fast'})
+        # turbo decode profile
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'decode_profile': 'turbo',
+        })
+        sb.gen_frames(4, params={'frame_size': (160, 90)})
+        self.assertEqual(sb.frames[0].image.size, (160, 90))
+        with self.assertRaises(ValueError):
+            StoryBoard(self.videofile, params={'decode_profile': 'fast'})
+        # frame timeout
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'frame_timeout': 60,
+        })
+        sb.gen_frames(4)
+        self.assertEqual(len(sb.frames), 4)
+        with self.assertRaises(ValueError):
+            StoryBoard(self.videofile, params={'frame_timeout': 0})
+        # byte range estimates for readahead
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        })
+        timestamps = [1.0, 4.0, 7.0]
+        byte_ranges = sb._estimate_byte_ranges(timestamps, 'input')
+        offsets = [offset for offset, _ in byte_ranges]
+        self.assertEqual(offsets, sorted(offsets))
+        for offset, length in byte_ranges:
+            self.assertGreater(length, 0)
+            self.assertLessEqual(offset + length, sb.video.size)
+        sb.video.compute_keyframes()
+        # the only keyframe is at the start
+        for offset, _ in sb._estimate_byte_ranges(timestamps, 'input'):
+            self.assertEqual(offset, sb.video._keyframe_positions[0])
+        self.assertIsNone(sb._estimate_byte_ranges(timestamps, 'exact'))
+        # streaming thumbnails into the canvas gives the same storyboard
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        })
+        board = sb.gen_storyboard(params={'tile': (3, 2)})
+        streamed_sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        })
+        streamed_board = streamed_sb.gen_storyboard(params={
+            'tile': (3, 2),
+            'streaming': True,
+        })
+        self.assertEqual(streamed_board.size, board.size)
+        self.assertEqual(streamed_board.tobytes(), board.tobytes())
+        self.assertEqual(streamed_sb.frames, [])
+        self.assertEqual(len(streamed_sb._frame_pool), 0)
+        board.close()
+        streamed_board.close()
+        # progressive refinement, starting with a keyframe preview
+        previews = []
+        progressive_board = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        }).gen_storyboard(params={
+            'tile': (3, 2),
+            'preview_callback': previews.append,
+        })
+        # the preview, then one refinement per thumbnail
+        self.assertEqual(len(previews), 7)
+        for preview in previews:
+            self.assertEqual(preview.size, progressive_board.size)
+        self.assertEqual(previews[-1].tobytes(), progressive_board.tobytes())
+        reference_board = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        }).gen_storyboard(params={'tile': (3, 2)})
+        self.assertEqual(progressive_board.tobytes(),
+                         reference_board.tobytes())
+        progressive_board.close()
+        reference_board.close()
+        # composed by FFmpeg, with the same layout
+        for draw_timestamp in [False, True]:
+            board_params = {
+                'tile': (3, 2),
+                'thumbnail_width': 160,
+                'draw_timestamp': draw_timestamp,
+            }
+            board = sb.gen_storyboard(params=board_params)
+            ffmpeg_board = sb.gen_storyboard(
+                params=dict(board_params, compositor='ffmpeg'))
+            self.assertEqual(ffmpeg_board.size, board.size)
+            self.assertEqual(ffmpeg_board.tobytes(), board.tobytes())
+            board.close()
+            ffmpeg_board.close()
+        with self.assertRaises(ValueError):
+            sb.gen_storyboard(params={'compositor': 'gimp'})
+        # fixed interval layout, with as many rows as needed
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        })
+        board = sb.gen_storyboard(params={
+            'tile': (2, 1),
+            'thumbnail_width': 160,
+            'frame_interval': 2.0,
+            'include_metadata_sheet': False,
+            'include_promotional_banner': False,
+            'margins': (0, 0),
+        })
+        # five frames in three rows of two
+        self.assertEqual(board.size, (160 * 2 + 8, 90 * 3 + 6 * 2))
+        self.assertEqual(len(sb._frame_pool), 5)
+        board.close()
+        self.assertFalse(sb.refresh())
+        with self.assertRaises(ValueError):
+            sb.gen_storyboard(params={'frame_interval': 0})
+        # frames of several storyboards extracted together
+        storyboards = [StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        }) for _ in range(3)]
+        prefetch_thumbnail_frames(storyboards, 6, params={
+            'thumbnail_width': 160,
+        })
+        for prefetched_sb in storyboards:
+            self.assertEqual(len(prefetched_sb._frame_pool), 6)
+        prefetched_board = storyboards[0].gen_storyboard(params={
+            'tile': (3, 2),
+            'thumbnail_width': 160,
+            'streaming': True,
+        })
+        reference_board = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        }).gen_storyboard(params={
+            'tile': (3, 2),
+            'thumbnail_width': 160,
+            'streaming': True,
+        })
+        self.assertEqual(prefetched_board.size, reference_board.size)
+        self.assertEqual(prefetched_board.tobytes(),
+                         reference_board.tobytes())
+        prefetched_board.close()
+        reference_board.close()
+
+    def test_audio_storyboard(self):
+        fd, audiofile = tempfile.mkstemp(prefix='storyboard-test-',
+                                         suffix='.wav')
+        os.close(fd)
+        try:
+            with open(os.devnull, 'wb') as devnull:
+                subprocess.check_call([
+                    self.ffmpeg_bin, '-f', 'lavfi', '-i', 'sine=d=2',
+                    '-y', audiofile,
+                ], stdout=devnull, stderr=devnull)
+            sb = StoryBoard(audiofile, params={
+                'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            })
+            for visualization in ['waveform', 'spectrogram']:
+                board = sb.gen_storyboard(params={
+                    'tile': (4, 4),
+                    'thumbnail_width': 160,
+                    'audio_visualization': visualization,
+                    'include_metadata_sheet': False,
+                    'include_promotional_banner': False,
+                    'margins': (0, 0),
+                })
+                # one strip as wide as the grid
+                self.assertEqual(board.size, (160 * 4 + 8 * 3, 160))
+                board.close()
+            board = sb.gen_storyboard()
+            self.assertEqual(board.mode, 'RGB')
+            board.close()
+            with self.assertRaises(ValueError):
+                sb.gen_storyboard(params={'audio_visualization': 'vu'})
+        finally:
+            os.remove(audiofile)
+
+    def test_still_image(self):
+        fd, imagefile = tempfile.mkstemp(prefix='storyboard-test-',
+                                         suffix='.jpg')
+        os.close(fd)
+        try:
+            Image.new('RGB', (320, 180), 'pink').save(imagefile, 'jpeg')
+            sb = StoryBoard(imagefile, params={
+                'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            })
+            self.assertTrue(sb.video.still_image)
+            sb.gen_frames(3, params={'frame_size': (160, 90)})
+            self.assertEqual([frame.timestamp for frame in sb.frames],
+                             [0.0] * 3)
+            self.assertEqual(sb.frames[0].image.size, (160, 90))
+            # a single thumbnail regardless of tile
+            board = sb.gen_storyboard(params={
+                'tile': (4, 4),
+                'thumbnail_width': 160,
+                'include_metadata_sheet': False,
+                'include_promotional_banner': False,
+                'margins': (0, 0),
+            })
+            self.assertEqual(board.size, (160, 90))
+            board.close()
+        finally:
+            os.remove(imagefile)
+
+    def test_stream(self):
+        with open(self.videofile, 'rb') as stream:
+            sb = StoryBoard(stream, params={
+                'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            })
+            board = sb.gen_storyboard(params={
+                'tile': (3, 2),
+                'thumbnail_width': 160,
+                'include_sha1sum': True,
+            })
+            self.assertEqual(board.mode, 'RGB')
+            board.close()
+            self.assertTrue(sb.video.stream_consumed)
+            self.assertIsNotNone(sb.video.sha1sum)
+            # the frames are pooled after the single pass
+            sb.gen_frames(6, params={'frame_size': (160, 90)})
+            self.assertEqual(len(sb.frames), 6)
+            # nor extracted again
+            with self.assertRaises(OSError):
+                sb.gen_frames(6, params={'frame_size': (80, 45)})
+        with open(self.videofile, 'rb') as stream:
+            sb = StoryBoard(stream, params={
+                'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            })
+            with self.assertRaises(ValueError):
+                sb.gen_storyboard(params={'frame_interval': 2.0})
+
+    def test_scene_selection(self):
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        })
+        # no scene change in a uniformly pink video, so the frames
+        # closest to the middle of each section (within a quarter
+        # section) stand in
+        sb.gen_frames(4, params={
+            'frame_size': (160, 90),
+            'frame_selection': 'scene',
+        })
+        self.assertEqual(len(sb.frames), 4)
+        for index, frame in enumerate(sb.frames):
+            self.assertAlmostEqual(frame.timestamp,
+                                   sb.video.duration / 4 * (index + 1/2),
+                                   delta=sb.video.duration / 16)
+        board = sb.gen_storyboard(params={
+            'tile': (2, 2),
+            'thumbnail_width': 160,
+            'frame_selection': 'scene',
+            # falls back to the pillow compositor
+            'compositor': 'ffmpeg',
+        })
+        self.assertEqual(board.mode, 'RGB')
+        board.close()
+        with self.assertRaises(ValueError):
+            sb.gen_storyboard(params={'frame_selection': 'scene',
+                                      'frame_interval': 2.0})
+        with self.assertRaises(ValueError):
+            sb.gen_frames(4, params={'frame_selection': 'random'})
+
+    def test_frame_screening(self):
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+        })
+        # a uniformly pink video is all blank, with no alternative
+        sb.gen_frames(4, params={
+            'frame_size': (160, 90),
+            'frame_screening': True,
+            'screening_retries': 1,
+        })
+        self.assertEqual(len(sb.frames), 4)
+        self.assertEqual(sb.screening_report['screened'], 4)
+        self.assertEqual(sb.screening_report['rejected'], {'blank': 4})
+        self.assertEqual(sb.screening_report['replaced'], 0)
+        self.assertEqual(sb.screening_report['extra_frames'], 4)
+        self.assertGreaterEqual(sb.screening_report['seconds'], 0)
+        board = sb.gen_storyboard(params={
+            'tile': (2, 2),
+            'thumbnail_width': 160,
+            'frame_screening': True,
+            'streaming': True,
+        })
+        self.assertEqual(board.mode, 'RGB')
+        board.close()
+        with self.assertRaises(ValueError):
+            sb.gen_storyboard(params={'frame_screening': True,
+                                      'frame_interval': 2.0})
+        with self.assertRaises(ValueError):
+            sb.gen_frames(4, params={'screening_retries': 7})
+
+    def test_sharpness_candidates(self):
+        sb = StoryBoard(self.videofile, params={
+            'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            'sharpness_candidates': 3,
+        })
+        sb.gen_frames(4, params={'frame_size': (160, 90)})
+        self.assertEqual(len(sb.frames), 4)
+        self.assertEqual(sb.sharpness_report['windows'], 4)
+        self.assertEqual(sb.sharpness_report['candidates'], 12)
+        # all candidates of a uniformly pink video tie, and ties go to
+        # the original timestamps
+        self.assertEqual(sb.sharpness_report['moved'], 0)
+        self.assertEqual([frame.timestamp for frame in sb.frames],
+                         [sb.video.duration / 4 * (i + 1/2)
+                          for i in range(4)])
+        board = sb.gen_storyboard(params={
+            'tile': (2, 2),
+            'thumbnail_width': 160,
+            'compositor': 'ffmpeg',
+        })
+        self.assertEqual(board.mode, 'RGB')
+        board.close()
+        with self.assertRaises(ValueError):
+            StoryBoard(self.videofile, params={
+                'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+                'sharpness_candidates': 0,
+            })
+
+    def test_playlist(self):
+        playlist_dir = tempfile.mkdtemp(prefix='storyboard-test-')
+        playlist_file = os.path.join(playlist_dir, 'index.m3u8')
+        try:
+            with open(os.devnull, 'wb') as devnull:
+                subprocess.check_call([
+                    self.ffmpeg_bin,
+                    '-f', 'lavfi', '-i', 'color=c=pink:s=320x180:d=6',
+                    '-g', '25',
+                    '-f', 'hls', '-hls_time', '2', '-hls_list_size', '0',
+                    '-y', playlist_file,
+                ], stdout=devnull, stderr=devnull)
+            sb = StoryBoard(playlist_file, params={
+                'bins': (self.ffmpeg_bin, self.ffprobe_bin),
+            })
+            sb.gen_frames(6, params={'frame_size': (160, 90), 'jobs': 2})
+            self.assertEqual(len(sb.frames), 6)
+            # labeled with timestamps of the playlist, not of segments
+            self.assertEqual([frame.timestamp for frame in sb.frames],
+                             [sb.video.duration / 6 * (i + 1/2)
+                              for i in range(6)])
+            for frame in sb.frames:
+                self.assertEqual(frame.image.size, (160, 90))
+            board = sb.gen_storyboard(params={
+                'tile': (3, 2),
+                'thumbnail_width': 160,
+                # falls back to the pillow compositor
+                'compositor': 'ffmpeg',
+            })
+            self.assertEqual(board.mode, 'RGB')
+            board.close()
+        finally:
+            shutil.rmtree(playlist_dir)
 
     def assertImageFormat(self, image_format):
         image = sys.stdout.getvalue().strip()
@@ -216,6 +675,71 @@ class TestStoryBoard(unittest.TestCase):
                         self.assertImageFormat('jpeg')
                         self.assertProgressPrinted()
 
+            # several videos, one of which is bogus
+            with capture_stdout():
+                with capture_stderr():
+                    sys.argv[1:] = [self.videofile,
+                                    self.videofile + '.nonexistent',
+                                    self.videofile]
+                    self.assertEqual(main(), 1)
+                    images = sys.stdout.getvalue().split()
+                    self.assertEqual(len(images), 2)
+                    for image in images:
+                        self.assertEqual(imghdr.what(image), 'jpeg')
+                        os.remove(image)
+
+            # concurrent jobs via CLI argument
+            with capture_stdout():
+                with capture_stderr():
+                    sys.argv[1:] = ['--jobs', '4', self.videofile]
+                    main()
+                    self.assertImageFormat('jpeg')
+                    self.assertProgressNotPrinted()
+
+            # keyframe seeking via CLI argument
+            with capture_stdout():
+                with capture_stderr():
+                    sys.argv[1:] = ['--seek-mode', 'auto',
+                                    '--seek-tolerance', '10', self.videofile]
+                    main()
+                    self.assertImageFormat('jpeg')
+                    self.assertProgressNotPrinted()
+
+            # frame cache via CLI argument
+            with capture_stdout():
+                with capture_stderr():
+                    cache_dir = os.path.join(home, 'cache')
+                    sys.argv[1:] = ['--cache-dir', cache_dir, self.videofile]
+                    main()
+                    self.assertImageFormat('jpeg')
+                    self.assertProgressNotPrinted()
+                    self.assertTrue(os.listdir(cache_dir))
+
+            # turbo decode profile via CLI argument
+            with capture_stdout():
+                with capture_stderr():
+                    sys.argv[1:] = ['--decode-profile', 'turbo',
+                                    self.videofile]
+                    main()
+                    self.assertImageFormat('jpeg')
+                    self.assertProgressNotPrinted()
+
+            # FFmpeg compositor via CLI argument
+            with capture_stdout():
+                with capture_stderr():
+                    sys.argv[1:] = ['--compositor', 'ffmpeg', self.videofile]
+                    main()
+                    self.assertImageFormat('jpeg')
+                    self.assertProgressNotPrinted()
+
+            # frame timeout via CLI argument
+            with capture_stdout():
+                with capture_stderr():
+                    sys.argv[1:] = ['--frame-timeout', '60', self.videofile]
+                    main()
+                    self.assertImageFormat('jpeg')
+                    self.assertProgressNotPrinted()
+
             # PNG via CLI argument
             with capture_stdout():
                 with capture_stderr():